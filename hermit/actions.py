@@ -3,11 +3,30 @@ Structured actions for Hermit.
 LLM proposes actions, we render them to shell commands.
 """
 
+import shlex
 from dataclasses import dataclass
 from typing import Optional
-import json
 
-@dataclass
+from hermit.config import get_extension_categories
+
+try:
+    import orjson as json  # C parser, same loads()/JSONDecodeError API
+except ImportError:
+    import json
+
+# Escapes text for use inside a single-quoted shell word, in one C-level pass
+_QUOTE_TABLE = str.maketrans({"'": "'\\''"})
+
+def _shell_path(path: str) -> str:
+    """Path quoted as one shell word, with a leading ~ left expandable (as it
+    was unquoted) by writing it as "$HOME"."""
+    if path == "~":
+        return '"$HOME"'
+    if path.startswith("~/"):
+        return '"$HOME"/' + shlex.quote(path[2:])
+    return shlex.quote(path)
+
+@dataclass(slots=True)
 class Action:
     """Base action that LLM can propose."""
     action: str
@@ -20,7 +39,7 @@ class Action:
         """Human-readable description."""
         raise NotImplementedError
 
-@dataclass
+@dataclass(slots=True)
 class ListFiles(Action):
     action: str = "list_files"
     path: str = "."
@@ -40,7 +59,7 @@ class ListFiles(Action):
     def describe(self) -> str:
         return f"List files in {self.path}"
     
-@dataclass
+@dataclass(slots=True)
 class ReadFile(Action):
     action: str = "read_file"
     path: str = ""
@@ -51,21 +70,26 @@ class ReadFile(Action):
     def describe(self) -> str:
         return f"Read contents of {self.path}"
 
-@dataclass  
+@dataclass(slots=True)
 class CreateFile(Action):
     action: str = "create_file"
     path: str = ""
     content: str = ""
     
     def render(self) -> str:
-        # Escape content for shell
-        escaped = self.content.replace("'", "'\\''")
-        return f"echo '{escaped}' > {self.path}"
+        # A quoted heredoc needs no escaping (quotes, backslashes, $ and
+        # newlines are all literal) and the content stays readable in the
+        # command preview. Ends with a newline, like the old `echo '...' >`.
+        delimiter = "EOF"
+        lines = set(self.content.split("\n"))
+        while delimiter in lines:
+            delimiter += "_"
+        return f"cat > {_shell_path(self.path)} <<'{delimiter}'\n{self.content}\n{delimiter}"
     
     def describe(self) -> str:
         return f"Create file {self.path}"
 
-@dataclass
+@dataclass(slots=True)
 class DeleteFiles(Action):
     action: str = "delete_files"
     path: str = ""
@@ -75,7 +99,7 @@ class DeleteFiles(Action):
     def render(self) -> str:
         if self.pattern:
             if self.recursive:
-                return f"find {self.path} -name '{self.pattern}' -delete"
+                return f"find {self.path} -name '{self.pattern.translate(_QUOTE_TABLE)}' -delete"
             return f"rm {self.path}/{self.pattern}"
         if self.recursive:
             return f"rm -r {self.path}"
@@ -86,7 +110,7 @@ class DeleteFiles(Action):
             return f"Delete files matching {self.pattern} in {self.path}"
         return f"Delete {self.path}"
     
-@dataclass
+@dataclass(slots=True)
 class MoveFile(Action):
     action: str = "move_file"
     source: str = ""
@@ -104,30 +128,51 @@ class MoveFile(Action):
             return f"Move {count} files to {self.destination}"
         return f"Move {self.source} to {self.destination}"
 
-@dataclass
+# Extension → folder for organize_by_type; anything else with an extension goes to "other".
+# The auto_organize_extensions preference is layered on top (see render()).
+ORGANIZE_SUFFIXES = {
+    **dict.fromkeys([".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".bmp"], "images"),
+    **dict.fromkeys([".pdf", ".doc", ".docx", ".txt", ".md", ".rtf",
+                     ".pages", ".key", ".ppt", ".pptx"], "documents"),
+    **dict.fromkeys([".mp3", ".wav", ".flac", ".aac", ".ogg"], "audio"),
+    **dict.fromkeys([".mp4", ".mov", ".avi", ".mkv", ".webm"], "video"),
+    **dict.fromkeys([".zip", ".tar", ".gz", ".rar", ".7z"], "archives"),
+    **dict.fromkeys([".csv", ".xlsx", ".xls", ".numbers"], "spreadsheets"),
+    **dict.fromkeys([".dmg", ".pkg", ".deb", ".rpm", ".exe"], "installers"),
+}
+
+def _py_literal(value) -> str:
+    """Python literal for a str/dict, written as JSON so it uses double quotes
+    and stays readable once the script is shell-quoted."""
+    text = json.dumps(value)
+    return text.decode() if isinstance(text, bytes) else text
+
+@dataclass(slots=True)
 class OrganizeByType(Action):
     action: str = "organize_by_type"
     path: str = "."
     
     def render(self) -> str:
-        # Proper logic that doesn't move folders into each other
-        return f"""cd {self.path} && 
-mkdir -p images documents audio video archives spreadsheets installers other &&
-for f in *.jpg *.jpeg *.png *.gif *.webp *.svg *.bmp; do [ -f "$f" ] && mv "$f" images/; done 2>/dev/null;
-for f in *.pdf *.doc *.docx *.txt *.md *.rtf; do [ -f "$f" ] && mv "$f" documents/; done 2>/dev/null;
-for f in *.mp3 *.wav *.flac *.aac *.ogg; do [ -f "$f" ] && mv "$f" audio/; done 2>/dev/null;
-for f in *.mp4 *.mov *.avi *.mkv *.webm; do [ -f "$f" ] && mv "$f" video/; done 2>/dev/null;
-for f in *.zip *.tar *.gz *.rar *.7z; do [ -f "$f" ] && mv "$f" archives/; done 2>/dev/null;
-for f in *.csv *.xlsx *.xls *.numbers; do [ -f "$f" ] && mv "$f" spreadsheets/; done 2>/dev/null;
-for f in *.dmg *.pkg *.deb *.rpm *.exe; do [ -f "$f" ] && mv "$f" installers/; done 2>/dev/null;
-for f in *.pages *.key *.ppt *.pptx; do [ -f "$f" ] && mv "$f" documents/; done 2>/dev/null;
-for f in *.*; do [ -f "$f" ] && mv "$f" other/; done 2>/dev/null;
-true"""
+        # One directory scan and rename(2) per file, instead of a glob
+        # loop per category forking `[` and `mv` for every file.
+        # Only top-level files move, so folders never end up inside each other.
+        script = (
+            "import os, shutil\n"
+            # Python doesn't expand ~ or $HOME the way `cd {path}` did
+            f"p = os.path.expanduser(os.path.expandvars({_py_literal(self.path)}))\n"
+            f"m = {_py_literal({**ORGANIZE_SUFFIXES, **get_extension_categories()})}\n"
+            'for d in {*m.values(), "other"}: os.makedirs(os.path.join(p, d), exist_ok=True)\n'
+            "for e in list(os.scandir(p)):\n"
+            '    if e.is_file() and "." in e.name and not e.name.startswith("."):\n'
+            '        d = m.get(os.path.splitext(e.name)[1].lower(), "other")\n'
+            "        shutil.move(e.path, os.path.join(p, d, e.name))\n"
+        )
+        return f"python3 -c {shlex.quote(script)}"
     
     def describe(self) -> str:
         return f"Organize files in {self.path} by type"
 
-@dataclass
+@dataclass(slots=True)
 class CreateDirectory(Action):
     action: str = "create_directory"
     path: str = ""
@@ -138,7 +183,7 @@ class CreateDirectory(Action):
     def describe(self) -> str:
         return f"Create directory {self.path}"
 
-@dataclass
+@dataclass(slots=True)
 class FindFiles(Action):
     action: str = "find_files"
     path: str = "."
@@ -152,13 +197,13 @@ class FindFiles(Action):
         elif self.file_type == "directory":
             cmd += " -type d"
         if self.pattern:
-            cmd += f" -name '{self.pattern}'"
+            cmd += f" -name '{self.pattern.translate(_QUOTE_TABLE)}'"
         return cmd
 
     def describe(self) -> str:
         return f"Find files matching {self.pattern} in {self.path}"
 
-@dataclass
+@dataclass(slots=True)
 class RunCommand(Action):
     """Fallback for commands we don't have a specific action for."""
     action: str = "run_command"
@@ -183,18 +228,23 @@ ACTION_MAP = {
     "organize_by_type": OrganizeByType,
 }
 
-def parse_action(json_str: str) -> Action:
+# Field names each action accepts, computed once
+ACTION_FIELDS = {cls: frozenset(cls.__dataclass_fields__) for cls in ACTION_MAP.values()}
+
+def parse_action(json_str: str | dict) -> Action:
+    """Build an Action from its JSON text, or from the already-parsed dict."""
     try:
-        data = json.loads(json_str)
+        data = json_str if isinstance(json_str, dict) else json.loads(json_str)
 
         action_type = data.get("action", "run_command")
         action_class = ACTION_MAP.get(action_type, RunCommand)
 
-        valid_fields = {k: v for k, v in data.items() 
-                       if k in action_class.__dataclass_fields__}
-        
+        valid_fields = {k: data[k] for k in data.keys() & ACTION_FIELDS[action_class]}
+
         return action_class(**valid_fields)
-    except (json.JSONDecodeError, TypeError) as e:
+    except (json.JSONDecodeError, ValueError, TypeError) as e:
+        if isinstance(json_str, dict):
+            json_str = _py_literal(json_str)
         return RunCommand(command=json_str)
     
 if __name__ == "__main__":
@@ -1,32 +1,65 @@
-from dotenv import load_dotenv
-load_dotenv()
-
+import codecs
+import functools
 import os
+import re
+import selectors
+import shlex
+import shutil
 import subprocess
 import sys
 import signal
-import json
+import sqlite3
+import struct
+import time
+from collections import deque
+from abc import ABC, abstractmethod
 from hermit.policy import check_command, RiskLevel
 from hermit.actions import parse_action
 from hermit.mounts import list_mounts
 from hermit.llm_backend import create_backend, LLMBackend
-from hermit.config import load_config, ensure_setup, get_cgroup_config
-from hermit.planner import system_prompt, parse_plan
+from hermit.config import (CONFIG_FILE, load_config, ensure_setup, get_preference,
+                           get_allowed_directories, config_cli, invalidate_config_cache,
+                           expand_user_path)
+from hermit.planner import system_prompt, parse_plan, StepStream
 from hermit.executor import execute_plan
+from hermit.setup_sandbox import main as run_setup
+from hermit.llm_cache import LLMCache, PromptStore, SemanticCache, make_key
 from hermit import audit
 from hermit import ui
 
 SANDBOX_ROOT = "/home/ubuntu/sandbox-root"
 
+# Checked once in full; after that only the sentinel is re-stat'd
+SANDBOX_SENTINEL = f"{SANDBOX_ROOT}/sandbox/sandbox_wrapper.py"
+SANDBOX_REQUIRED = (
+    f"{SANDBOX_ROOT}/bin/sh",
+    f"{SANDBOX_ROOT}/usr/bin/touch",
+    f"{SANDBOX_ROOT}/bin/cat",
+    f"{SANDBOX_ROOT}/usr/bin/python3",
+    SANDBOX_SENTINEL,
+)
+
+_sandbox_ready_mtime = None  # Sentinel mtime when the sandbox was last found ready
+
 def is_sandbox_ready() -> bool:
-    """Check if sandbox environment is properly set up."""
-    required = [
-        f"{SANDBOX_ROOT}/bin/sh",
-        f"{SANDBOX_ROOT}/usr/bin/touch",
-        f"{SANDBOX_ROOT}/usr/bin/python3",
-        f"{SANDBOX_ROOT}/sandbox/sandbox_wrapper.py",
-    ]
-    return all(os.path.exists(p) for p in required)
+    """Check if sandbox environment is properly set up.
+
+    After a full check passes, later calls only stat the wrapper script:
+    setup rewrites it, so an unchanged mtime means nothing was rebuilt.
+    """
+    global _sandbox_ready_mtime
+    try:
+        mtime = os.stat(SANDBOX_SENTINEL).st_mtime_ns
+    except OSError:
+        _sandbox_ready_mtime = None
+        return False
+    if mtime == _sandbox_ready_mtime:
+        return True
+
+    if all(os.path.exists(p) for p in SANDBOX_REQUIRED):
+        _sandbox_ready_mtime = mtime
+        return True
+    return False
 
 
 def ensure_sandbox():
@@ -43,19 +76,32 @@ def ensure_sandbox():
         sys.exit(1)
 
     print()
-    from hermit.setup_sandbox import main as run_setup
     run_setup()
     return True
 
 mounted_paths = []
 cleanup_done = False
 llm_backend: LLMBackend = None
-
-def init_llm_backend():
+llm_cache = LLMCache()
+semantic_cache: SemanticCache = None
+use_cache = True
+sandbox_strategy = None
+spinner = ui.Spinner()  # Reused every turn
+planner_prompt = ""  # Planner system prompt, rebuilt only when folders change
+config_mtime = None  # Last seen config.json mtime, see config_changed()
+
+def refresh_system_prompt():
+    """Rebuild the planner prompt. Sending the same string every turn keeps
+    the prefix byte-identical for llama.cpp / provider prompt caching."""
+    global planner_prompt
+    planner_prompt = system_prompt()
+
+def init_llm_backend(config: dict = None):
     """Initialize LLM backend from config."""
     global llm_backend
-    from hermit import ui
-    config = load_config()
+    if config is None:
+        config = load_config()
+    refresh_system_prompt()
     llm_backend = create_backend(config)
     
     if not llm_backend.is_available():
@@ -71,112 +117,506 @@ def init_llm_backend():
 
 
     if config.get("llm_backend") == "llamacpp":
-        ui.info("Loading model...")
-        try:
-            # This triggers the lazy load
-            llm_backend._get_llm()
-        except Exception as e:
-            ui.error(f"Failed to load model: {e}")
-            sys.exit(1)
+        # Load (and prefill the system prompt) in the background so the
+        # prompt appears immediately; the first query waits if needed.
+        llm_backend.preload(planner_prompt)
     
     return llm_backend
 
 
-def execute_unsafe(command: str) -> str:
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-    return result.stdout + result.stderr
+def get_action(user_input: str) -> str:
+    """Get the raw plan JSON for a request, reusing a cached answer if we have one."""
+    # Stray surrounding whitespace shouldn't cost a cache miss. Case is kept:
+    # "delete Notes.txt" and "delete notes.txt" are different files.
+    key = make_key(llm_backend.get_name(), planner_prompt, user_input.strip(),
+                   llm_backend.conversation_history)
+
+    # Only plans for a fresh conversation go to disk: one made mid-conversation
+    # can't be replayed meaningfully in a later session
+    persist = not llm_backend.conversation_history
+    # Paraphrase matches only among plans made under the same backend, prompt
+    # and conversation
+    scope = make_key(llm_backend.get_name(), planner_prompt, "", llm_backend.conversation_history)
+
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is None and semantic_cache is not None:
+            cached = semantic_cache.get(user_input, scope)
+            if cached is not None:
+                llm_cache.put(key, cached, persist)
+        if cached is not None:
+            print(f"  {ui.dim('cached')}")
+            audit.log_cache_hit(user_input)
+            # The model didn't see this turn, but later ones may refer to it
+            llm_backend.record_turn(user_input, cached)
+            return cached
+
+    # Show steps on the spinner line as the plan streams in
+    steps = StepStream()
+    def on_chunk(text):
+        for step in steps.feed(text):
+            description = str(step.get("description", ""))[:50]
+            spinner.status = f"Planned step {step.get('step_id', '?')}: {description}"
+
+    spinner.start()
+    try:
+        raw_plan = llm_backend.get_completion(planner_prompt, user_input, stream_fn=on_chunk)
+    finally:
+        spinner.stop()
+
+    # Only remember answers we can actually use
+    if use_cache:
+        try:
+            if len(parse_plan(raw_plan)) > 0:
+                llm_cache.put(key, raw_plan, persist)
+                if semantic_cache is not None and _read_only_plan(raw_plan):
+                    semantic_cache.put(user_input, raw_plan, scope)
+        except Exception:
+            pass
+
+    return raw_plan
+
+
+def _read_only_plan(raw_plan: str) -> bool:
+    """True if every step is low risk by policy. Only these may be reused for
+    a paraphrase: "delete report-a.pdf" embeds close to "delete report-b.pdf",
+    and replaying that plan would delete the wrong file."""
+    return all(
+        check_command(parse_action(step.action_json).render()).risk == RiskLevel.LOW
+        for step in parse_plan(raw_plan).steps
+    )
+
 
+def init_prompt_store():
+    """Attach the on-disk cache so plans carry over between sessions."""
+    if not use_cache:
+        return
+    try:
+        llm_cache.store = PromptStore()
+    except (OSError, sqlite3.Error) as e:
+        ui.warning(f"Prompt cache disabled: {e}")
 
-def execute_sandboxed(command: str) -> str:
-    # Get timeout from config
-    from hermit.config import get_allowed_directories
-    import shlex
 
-    cgroup_cfg = get_cgroup_config()
-    timeout = cgroup_cfg.get('timeout_seconds', 30)
+def init_semantic_cache():
+    """Enable the embedding-based cache if the user turned it on."""
+    global semantic_cache
+    semantic_cache = None
 
-    # building bind mount commands for user directories
-    user_mounts = []
-    for d in get_allowed_directories():
-        host = os.path.expanduser(d["host"])
-        sandbox_relative = d["sandbox"].lstrip("/")
-        sandbox_absolute = f"{SANDBOX_ROOT}/{sandbox_relative}"
-        if os.path.exists(host):
-            user_mounts.append(f"mount --bind {shlex.quote(host)} {shlex.quote(sandbox_absolute)}")
+    if not use_cache or not get_preference("semantic_cache"):
+        return
+    if not SemanticCache.is_available():
+        ui.warning("Semantic cache needs: pip install 'hermit-shell[semantic]'")
+        return
+    semantic_cache = SemanticCache()
+    semantic_cache.warm()
 
-    user_mount_script = "\n        ".join(user_mounts)
 
-    # Device nodes: bind-mount from host instead of mknod
-    dev_mounts = "\n        ".join([
-        f"mount --bind /dev/{d} {SANDBOX_ROOT}/dev/{d}"
-        for d in ["null", "zero", "random", "urandom"]
-        if os.path.exists(f"/dev/{d}")
-    ])
-    
-    safe_command = command.replace("'", "'\"'\"'")
-
-    inner_script = f"""
-        {dev_mounts}
-        
-        mount -t proc proc {SANDBOX_ROOT}/proc
-        
-        # User directories
-        {user_mount_script}
-        
-        # Enter sandbox
-        exec chroot {SANDBOX_ROOT} \\
-            /usr/bin/python3 /sandbox/sandbox_wrapper.py '{safe_command}'
+# Anything a plain argv can't express: pipes, redirects, globs, expansions,
+# subshells, comments, line continuations
+_SHELL_SYNTAX = re.compile(r"[|&;<>*?$`(){}\[\]~!#\\\n]")
+
+
+def shell_argv(command: str, env: dict) -> list:
+    """argv for command, skipping `sh -c` when the shell would add nothing.
+
+    Simple commands (`ls -la "My Files"`) are split with shlex and spawned
+    directly: one process instead of two. Anything using shell syntax,
+    variable assignments, or builtins (no executable on PATH) still goes
+    through sh.
     """
+    if not _SHELL_SYNTAX.search(command):
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            argv = []
+        if argv and "=" not in argv[0] and os.path.isabs(_resolve(argv[0], env.get("PATH"))):
+            return argv
+    return ["sh", "-c", command]
+
+
+def execute_unsafe(command: str, on_output=None) -> str:
+    env = dict(os.environ)
+    process = spawn(shell_argv(command, env), env)
+    return read_output(process, None, on_output)
+
 
-    cg = get_cgroup_config()
-    systemd_prefix = [
-        "systemd-run", "--user", "--scope",
-        f"-p", f"MemoryMax={cg.get('memory_max_mb', 512)}M",
-        f"-p", f"CPUQuota={cg.get('cpu_quota_percent', 50)}%",
-        f"-p", f"TasksMax={cg.get('pids_max', 100)}",
-        "--"
-    ]
-
-    wrapper_command = systemd_prefix + [
-        "unshare",
-        "--user", "--map-root-user",
-        "--mount",
-        "--pid", "--fork",
-        "bash", "-c", inner_script
-    ]
-
-    # Minimal env — don't leak API keys, tokens, etc. into sandbox
-    clean_env = {
-        "PATH": "/usr/sbin:/usr/bin:/sbin:/bin",
-        "HOME": "/root",
-        "LANG": "C",
-        "DBUS_SESSION_BUS_ADDRESS": os.environ.get("DBUS_SESSION_BUS_ADDRESS", ""),
-        "XDG_RUNTIME_DIR": os.environ.get("XDG_RUNTIME_DIR", ""),
-    }
-
-    process = subprocess.Popen(
-        wrapper_command,
+@functools.lru_cache(maxsize=32)
+def _resolve(name: str, path: str) -> str:
+    """PATH lookup for spawn(); cached since the same few binaries run every turn."""
+    return shutil.which(name, path=path) or name
+
+
+def spawn(argv: list, env: dict, stdin=None, stderr=subprocess.PIPE) -> subprocess.Popen:
+    """Start argv with its output piped back, without fork().
+
+    Given an absolute executable and close_fds=False, subprocess launches via
+    posix_spawn() (vfork semantics), so starting a sandbox doesn't copy the
+    page tables of a process that may be holding a multi-GB local model.
+    Python's own fds are non-inheritable, so nothing extra leaks into the child.
+    """
+    executable = _resolve(argv[0], env.get("PATH"))
+    return subprocess.Popen(
+        [executable, *argv[1:]],
+        stdin=stdin,
         stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        env=clean_env,
+        stderr=stderr,
+        env=env,
+        close_fds=False,
     )
 
-    # Wait for completion with timeout
+
+MAX_OUTPUT_CHARS = 1 << 20  # Kept per command; the terminal still sees everything
+
+
+class OutputBuffer:
+    """The last MAX_OUTPUT_CHARS of a command's output, so a runaway
+    `find /` can't grow hermit's memory without bound."""
+
+    def __init__(self, limit: int = MAX_OUTPUT_CHARS):
+        self.limit = limit
+        self.chunks = deque()
+        self.size = 0
+        self.truncated = False
+
+    def append(self, text: str):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size - len(self.chunks[0]) >= self.limit:
+            self.size -= len(self.chunks.popleft())
+            self.truncated = True
+
+    def getvalue(self) -> str:
+        text = "".join(self.chunks)
+        if len(text) > self.limit:
+            text = text[-self.limit:]
+            self.truncated = True
+        if self.truncated:
+            return "[... earlier output truncated]\n" + text
+        return text
+
+
+def read_output(process: subprocess.Popen, timeout, on_output=None) -> str:
+    """Collect a process's stdout+stderr as it arrives.
+
+    Each decoded chunk is handed to on_output (if given) straight away, so
+    long-running commands show progress instead of going quiet until exit.
+    Returns what was read, capped by OutputBuffer.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    sel = selectors.DefaultSelector()
+    decoders = {}
+    for stream in (process.stdout, process.stderr):
+        sel.register(stream.fileno(), selectors.EVENT_READ)
+        decoders[stream.fileno()] = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    output = OutputBuffer()
+    timed_out = False
     try:
-        stdout, stderr = process.communicate(timeout=timeout)
-        return stdout + stderr
-    except subprocess.TimeoutExpired:
+        while sel.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                break
+            for key, _ in sel.select(remaining):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    sel.unregister(key.fd)
+                    continue
+                text = decoders[key.fd].decode(data)
+                if text:
+                    output.append(text)
+                    if on_output:
+                        on_output(text)
+    finally:
+        sel.close()
+        process.stdout.close()
+        process.stderr.close()
+
+    if timed_out:
         process.kill()
-        process.communicate()  # Clean up
-        return f"Command timed out after {timeout} seconds"
+        process.wait()
+        message = f"Command timed out after {timeout} seconds"
+        if on_output:
+            on_output(f"\n{message}\n")
+        return output.getvalue() + f"\n{message}"
+
+    process.wait()
+    return output.getvalue()
+
+
+class SandboxWorker:
+    """A long-lived sandbox that runs each command sent to it.
+
+    Saves namespace setup and Python startup on every command. Framing over
+    the worker's stdin/stdout (see sandbox_wrapper.serve):
+      host → worker: 4-byte big-endian length + command
+      worker → host: 1-byte kind (b"S" started, b"O" output, b"X" exit)
+                     + 4-byte length + payload
+    """
+
+    def __init__(self, argv: list, env: dict):
+        # Commands' stderr comes back through the frames; the worker's own is
+        # only wrapper/unshare/systemd-run noise, and an unread pipe would
+        # eventually fill and block it
+        self.process = spawn(argv, env, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._fd = self.process.stdout.fileno()
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._fd, selectors.EVENT_READ)
+        self._buf = bytearray()  # Bytes read from the worker but not yet consumed
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_exact(self, n: int, deadline) -> bytes | None:
+        """Read exactly n bytes; None on timeout, EOFError if the worker died.
+
+        Reads 64 KiB at a time into a buffer that outlives the call, so a
+        burst of small frames costs one read() instead of two per frame.
+        """
+        buf = self._buf
+        while len(buf) < n:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if not self._sel.select(remaining):
+                continue
+            data = os.read(self._fd, 65536)
+            if not data:
+                raise EOFError("sandbox worker exited")
+            buf += data
+        data = bytes(buf[:n])
+        del buf[:n]
+        return data
+
+    def run(self, command: str, timeout, on_output=None) -> str:
+        """Run one command; same contract as read_output()."""
+        data = command.encode()
+        self.process.stdin.write(struct.pack(">I", len(data)) + data)
+        self.process.stdin.flush()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        output = OutputBuffer()
+        started = False  # Worker acknowledged the command, so it may have run
+        while True:
+            try:
+                header = self._read_exact(5, deadline)
+                payload = None if header is None else self._read_exact(
+                    struct.unpack(">I", header[1:])[0], deadline)
+            except EOFError:
+                if not started:
+                    raise  # Never reached the worker; caller may retry without it
+                self.close()
+                message = "Sandbox worker exited unexpectedly"
+                if on_output:
+                    on_output(f"\n{message}\n")
+                return output.getvalue() + f"\n{message}"
+            if payload is None:
+                # Can't interrupt just the one command; drop the whole worker
+                self.close()
+                message = f"Command timed out after {timeout} seconds"
+                if on_output:
+                    on_output(f"\n{message}\n")
+                return output.getvalue() + f"\n{message}"
+            if header[:1] == b"S":
+                started = True
+                continue
+            if header[:1] == b"X":
+                return output.getvalue()
+            text = decoder.decode(payload)
+            if text:
+                output.append(text)
+                if on_output:
+                    on_output(text)
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        self._sel.close()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class SandboxStrategy(ABC):
+    """How a command is launched into the chroot + namespace sandbox.
+
+    Subclasses only decide what wraps the `unshare` call; the mount script
+    and chroot entry are shared. With persistent=True, one SandboxWorker is
+    started on first use and serves every command after that.
+    """
+
+    def __init__(self, timeout: int = 30, persistent: bool = False):
+        self.timeout = timeout
+        self.persistent = persistent
+        self.worker: SandboxWorker = None
+        # Read once here rather than per command; rebuilt on settings/SIGHUP
+        self.directories = [
+            (expand_user_path(d["host"]), f"{SANDBOX_ROOT}/{d['sandbox'].lstrip('/')}")
+            for d in get_allowed_directories()
+        ]
+        # Device nodes: bind-mount from host instead of mknod
+        self.dev_mounts = "\n            ".join([
+            f"mount --bind /dev/{d} {SANDBOX_ROOT}/dev/{d}"
+            for d in ["null", "zero", "random", "urandom"]
+            if os.path.exists(f"/dev/{d}")
+        ])
+
+    @abstractmethod
+    def prefix(self) -> list:
+        """argv to prepend in front of `unshare`."""
+        pass
+
+    def argv(self, wrapper_args: list) -> list:
+        """Full argv that enters the sandbox and runs sandbox_wrapper.py."""
+        # building bind mount commands for user directories
+        user_mount_script = "\n            ".join(
+            f"mount --bind {shlex.quote(host)} {shlex.quote(sandbox_absolute)}"
+            for host, sandbox_absolute in self.directories
+            if os.path.exists(host)
+        )
+
+        inner_script = f"""
+            {self.dev_mounts}
+
+            # User directories
+            {user_mount_script}
+
+            # Enter sandbox; wrapper args arrive as "$@", never spliced into the script
+            exec chroot {SANDBOX_ROOT} \\
+                /usr/bin/python3 /sandbox/sandbox_wrapper.py "$@"
+        """
+
+        return self.prefix() + [
+            "unshare",
+            "--user", "--map-root-user",
+            "--mount",
+            "--pid", "--fork",
+            # If we kill unshare on timeout, its child (PID 1 of the namespace)
+            # gets SIGKILL too, and the kernel then reaps everything inside.
+            "--kill-child",
+            f"--mount-proc={SANDBOX_ROOT}/proc",
+            # Only the bind mounts need a shell: they must run inside the new
+            # mount namespace. Plain sh is enough and starts faster than bash.
+            "sh", "-c", inner_script, "hermit-sandbox", *wrapper_args
+        ]
+
+    @staticmethod
+    def env() -> dict:
+        # Minimal env — don't leak API keys, tokens, etc. into sandbox
+        return {
+            "PATH": "/usr/sbin:/usr/bin:/sbin:/bin",
+            "HOME": "/root",
+            "LANG": "C",
+            "DBUS_SESSION_BUS_ADDRESS": os.environ.get("DBUS_SESSION_BUS_ADDRESS", ""),
+            "XDG_RUNTIME_DIR": os.environ.get("XDG_RUNTIME_DIR", ""),
+        }
+
+    def execute(self, command: str, on_output=None) -> str:
+        if self.persistent:
+            if self.worker is None or not self.worker.alive():
+                self.worker = SandboxWorker(self.argv(["--serve"]), self.env())
+            try:
+                return self.worker.run(command, self.timeout, on_output)
+            except (EOFError, BrokenPipeError):
+                self.close()
+                ui.warning("Sandbox worker failed; running commands one at a time")
+                self.persistent = False
+
+        process = spawn(self.argv([command]), self.env())
+
+        return read_output(process, self.timeout, on_output)
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+
+class UnshareStrategy(SandboxStrategy):
+    """Namespaces + chroot only, no resource limits."""
+
+    def prefix(self) -> list:
+        return []
+
+
+class CgroupStrategy(SandboxStrategy):
+    """Run inside a transient systemd scope with cgroup resource limits."""
+
+    def __init__(self, cgroup_cfg: dict, persistent: bool = False):
+        super().__init__(cgroup_cfg.get("timeout_seconds", 30), persistent)
+        self._prefix = [
+            "systemd-run", "--user", "--scope",
+            "-p", f"MemoryMax={cgroup_cfg.get('memory_max_mb', 512)}M",
+            "-p", f"CPUQuota={cgroup_cfg.get('cpu_quota_percent', 50)}%",
+            "-p", f"TasksMax={cgroup_cfg.get('pids_max', 100)}",
+            "--"
+        ]
+
+    def prefix(self) -> list:
+        return self._prefix
+
+
+def create_sandbox_strategy(cgroup_cfg: dict, persistent: bool = False) -> SandboxStrategy:
+    """Factory: pick the strategy from the cgroups config section."""
+    if cgroup_cfg.get("enabled", True):
+        return CgroupStrategy(cgroup_cfg, persistent)
+    return UnshareStrategy(cgroup_cfg.get("timeout_seconds", 30), persistent)
+
+
+def init_sandbox_strategy(config: dict = None):
+    """(Re)build the sandbox strategy from config."""
+    global sandbox_strategy
+    if config is None:
+        config = load_config()
+    if sandbox_strategy is not None:
+        sandbox_strategy.close()
+    sandbox_strategy = create_sandbox_strategy(
+        config["cgroups"], bool(config["preferences"].get("persistent_sandbox"))
+    )
+
+
+def execute_sandboxed(command: str, on_output=None) -> str:
+    return sandbox_strategy.execute(command, on_output)
+
+def reload_config():
+    """Pick up edited cgroup limits and folders without restarting."""
+    init_sandbox_strategy()
+    refresh_system_prompt()
+
+def config_changed() -> bool:
+    """True if config.json changed since the last check. One stat per turn
+    instead of re-reading the file for every command."""
+    global config_mtime
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    changed = mtime != config_mtime
+    config_mtime = mtime
+    return changed
+
+def reload_handler(signum, frame):
+    """SIGHUP: reload config at the top of the next turn.
+
+    Not from here: the signal can land while a command runs on the
+    persistent worker, and rebuilding the sandbox closes it underneath.
+    """
+    global config_mtime
+    invalidate_config_cache()  # Re-read even if mtime and size look unchanged
+    config_mtime = -1  # No real mtime, so config_changed() reports True
 
 def cleanup_handler(signum, frame):
-    """Handle Ctrl+C gracefully."""
+    """Handle Ctrl+C and SIGTERM gracefully.
+
+    Exiting via SystemExit runs the pending finally blocks, so the current
+    audit turn is written before the log is fsync'd.
+    """
     global cleanup_done
     if not cleanup_done:
         print("\n")
         cleanup_done = True
+    audit.flush_audit(sync=True)
     print("  Goodbye!")
     sys.exit(0)
 
@@ -193,80 +633,158 @@ def show_plan_preview(plan):
         print(f"    {i + 1}. {step.description}{deps}")
     print()
 
+# Risk level → (prompt, answer that approves). Levels not listed run without asking.
+APPROVAL_PROMPTS = {
+    RiskLevel.HIGH.value: (f"\n  Type '{ui.orange('yes')}' to confirm: ", "yes"),
+    RiskLevel.MEDIUM.value: (f"  Run? ({ui.green('y')}/{ui.dim('n')}) ", "y"),
+}
+
 def get_user_approval(risk_level: str) -> bool:
-    """Approval callback for the executor."""
-    if risk_level == "high":
-        confirm = input(f"\n  Type '{ui.orange('yes')}' to confirm: ")
-        return confirm.lower() == "yes"
-    confirm = input(f"  Run? ({ui.green('y')}/{ui.dim('n')}) ")
-    return confirm.lower() == 'y'
+    """Ask the user to approve a command; used for single commands and plan steps."""
+    prompt_text, expected = APPROVAL_PROMPTS.get(risk_level, APPROVAL_PROMPTS[RiskLevel.MEDIUM.value])
+    return input(prompt_text).lower() == expected
+
+# Built-in REPL commands for both help screens: (command, description)
+REPL_HELP = [
+    ("help", "Show this help"),
+    ("settings", "Open settings"),
+    ("tree", "Show workspace structure"),
+    ("mounts", "Show mounted folders"),
+    ("audit", "Show command history"),
+    ("clear", "Clear conversation history"),
+    ("clear cache", "Forget cached plans"),
+    ("config show|set|reset", "View or change configuration"),
+    ("exit", "Quit hermit"),
+]
+
+# Help screens are constant, so each is formatted once on import
+# and printed with a single write.
+HELP_TEXT = "\n".join([
+    f"  {ui.bold('Sandboxed AI Shell Assistant')}",
+    "",
+    f"  {ui.dim('Usage:')} sudo hermit [OPTIONS]",
+    "",
+    f"  {ui.dim('Options:')}",
+    "    --unsafe     Disable sandbox (not recommended)",
+    "    --no-cache   Always ask the LLM, even for repeated requests",
+    "    --help       Show this help message",
+    "",
+    f"  {ui.dim('Commands (inside hermit):')}",
+    *(f"    {name:<28}{desc}" for name, desc in REPL_HELP),
+    "",
+])
+
+INLINE_HELP_TEXT = "\n".join([
+    "",
+    f"  {ui.bold('Commands:')}",
+    *(f"    {ui.dim(name)}{' ' * (25 - len(name))}{desc}" for name, desc in REPL_HELP),
+    "",
+    f"  {ui.bold('Or just ask me to do something:')}",
+    f"    {ui.dim('\"show my downloads\"')}",
+    f"    {ui.dim('\"organize files by type\"')}",
+    f"    {ui.dim('\"find all .py files\"')}",
+    "",
+])
 
 def show_help():
     """Show help with styled output."""
     ui.print_banner()
-    print(f"  {ui.bold('Sandboxed AI Shell Assistant')}")
-    print()
-    print(f"  {ui.dim('Usage:')} sudo hermit [OPTIONS]")
-    print()
-    print(f"  {ui.dim('Options:')}")
-    print(f"    --unsafe     Disable sandbox (not recommended)")
-    print(f"    --help       Show this help message")
-    print()
-    print(f"  {ui.dim('Commands (inside hermit):')}")
-    print(f"    help                        Show commands")
-    print(f"    settings                    Open settings")
-    print(f"    tree                        Show workspace structure")
-    print(f"    mounts                      Show mounted folders")
-    print(f"    audit                       Show command history")
-    print(f"    clear                       Clear conversation")
-    print(f"    exit                        Quit hermit")
-    print()
-    
+    print(HELP_TEXT)
+
 def show_inline_help():
     """Show help when inside the REPL."""
-    print()
-    print(f"  {ui.bold('Commands:')}")
-    print(f"    {ui.dim('help')}                     Show this help")
-    print(f"    {ui.dim('settings')}                 Open settings")
-    print(f"    {ui.dim('tree')}                     Show workspace structure")
-    print(f"    {ui.dim('mounts')}                   Show mounted folders")
-    print(f"    {ui.dim('audit')}                    Show command history")
-    print(f"    {ui.dim('clear')}                    Clear conversation history")
-    print(f"    {ui.dim('exit')}                     Quit hermit")
-    print()
-    print(f"  {ui.bold('Or just ask me to do something:')}")
-    print(f"    {ui.dim('\"show my downloads\"')}")
-    print(f"    {ui.dim('\"organize files by type\"')}")
-    print(f"    {ui.dim('\"find all .py files\"')}")
-    print()
+    print(INLINE_HELP_TEXT)
+
+def clear_history():
+    llm_backend.clear_history()
+    print("Conversation history cleared.")
+
+def clear_cache():
+    llm_cache.clear(persistent=True)
+    if semantic_cache is not None:
+        semantic_cache.clear()
+    print("Plan cache cleared.")
+
+def open_settings():
+    from hermit.settings_ui import run_settings
+    run_settings(mounted_paths)
+    # reload backend in case it changed
+    config = load_config()
+    init_llm_backend(config)
+    llm_cache.clear()
+    init_semantic_cache()
+    init_sandbox_strategy(config)
+    config_changed()  # Already reloaded; don't do it again next turn
+
+# Built-in REPL commands: exact (lowercased) input → handler
+COMMANDS = {
+    "help": show_inline_help,
+    "?": show_inline_help,
+    "audit": lambda: audit.show_recent(10),
+    "clear": clear_history,
+    "clear cache": clear_cache,
+    "tree": lambda: ui.print_tree(f"{SANDBOX_ROOT}/workspace"),
+    "settings": open_settings,
+    "mounts": lambda: list_mounts(mounted_paths),
+}
+
+def config_command(args: str) -> bool:
+    """`config <subcommand>` in the REPL. Anything that isn't a known
+    subcommand ("config files in ~/src") is left for the LLM."""
+    argv = args.split()
+    if argv and argv[0].lower() not in ("show", "set", "add-directory", "remove-directory", "reset"):
+        return False
+    return config_cli(argv)
+
+# REPL commands that take arguments: first word (lowercased) → handler(rest).
+# A handler returns False to pass the input on to the LLM instead.
+ARG_COMMANDS = {
+    "config": config_command,
+}
 
 def main():
-    global mounted_paths, cleanup_done
+    global mounted_paths, cleanup_done, use_cache
 
     # Handle --help before setup
     if "--help" in sys.argv or "-h" in sys.argv:
         show_help()
         return
 
+    # Only the REPL needs .env (OPENAI_* for the client, --unsafe commands'
+    # environment); importing this module shouldn't read it
+    from dotenv import load_dotenv
+    load_dotenv()
+
     sandboxed = "--unsafe" not in sys.argv
+    use_cache = "--no-cache" not in sys.argv
 
     # Check sandbox is ready (only in sandboxed mode)
     if sandboxed:
         ensure_sandbox()
 
     # Check API key is configured
-    ensure_setup()
+    config = ensure_setup()
 
-    init_llm_backend()
+    # One config read shared by everything set up below
+    if sandboxed:
+        init_sandbox_strategy(config)
+    init_llm_backend(config)
+    init_prompt_store()
+    init_semantic_cache()
+    config_changed()
     
     ui.print_banner()
     ui.print_status(sandboxed)
 
     print(f"  {ui.green(ui.DOT)} LLM: {llm_backend.get_name()}")
 
+    # The default SIGTERM action skips finally blocks and atexit
+    signal.signal(signal.SIGTERM, cleanup_handler)
+
     if sandboxed:
         print()
         signal.signal(signal.SIGINT, cleanup_handler)
+        signal.signal(signal.SIGHUP, reload_handler)
     else:
         ui.warning("Sandbox disabled - commands run directly on your system")
         print()
@@ -279,115 +797,99 @@ def main():
     try:
         while True:
             user_input = ui.prompt()
-            cmd = user_input.lower()
-
-            if not cmd or len(user_input.strip()) < 3:
-                continue
-            elif cmd in ['exit', 'quit']:
+            if config_changed():
+                reload_config()
+            # Tokenize once: exact match for plain commands, first word for the rest
+            parts = user_input.split(None, 1)
+            cmd = " ".join(parts).lower()
+            head = parts[0].lower() if parts else ""
+
+            if cmd in ('exit', 'quit'):
                 break
-            elif cmd in ['help', '?']:
-                show_inline_help()
-                continue
-            elif cmd == 'audit':
-                audit.show_recent(10)
-                continue
-            elif cmd == 'clear':
-                llm_backend.clear_history()
-                print("Conversation history cleared.")
+            elif cmd in COMMANDS:
+                COMMANDS[cmd]()
                 continue
-            elif cmd == 'tree':
-                ui.print_tree(f"{SANDBOX_ROOT}/workspace")
+            elif head in ARG_COMMANDS and ARG_COMMANDS[head](parts[1] if len(parts) > 1 else "") is not False:
                 continue
-            elif cmd == "settings":
-                from hermit.settings_ui import run_settings
-                run_settings(mounted_paths)
-                # reload backend in case it changed
-                init_llm_backend()
-                continue
-            elif cmd == "mounts":
-                list_mounts(mounted_paths)
+            elif len(cmd) < 3:
                 continue
 
-            # Get action from LLM with spinner
-            spinner = ui.Spinner()
-            spinner.start()
-            try:
-                raw_plan = llm_backend.get_completion(system_prompt(), user_input)
-                plan = parse_plan(raw_plan)
-            except Exception as e:
-                spinner.stop()
-                ui.error(f"Failed to parse plan: {e}")
-                print(f"  {ui.dim('Raw:')} {raw_plan}")
-                continue
-            finally:
-                spinner.stop()
+            # Everything logged this turn goes into one audit entry
+            with audit.begin_record():
+                # Get action from LLM (or cache)
+                raw_plan = ""
+                try:
+                    raw_plan = get_action(user_input)
+                    plan = parse_plan(raw_plan)
+                except Exception as e:
+                    ui.error(f"Failed to parse plan: {e}")
+                    print(f"  {ui.dim('Raw:')} {raw_plan}")
+                    continue
 
-            audit.log_command(user_input, f"plan:{len(plan)} steps")
+                audit.log_command(user_input, f"plan:{len(plan)} steps")
 
-            if len(plan) == 0:
-                ui.error("Couldn't understand that. Try rephrasing.")
-                continue
-            elif len(plan) == 1:
-                # simple
-                step = plan.steps[0]
-                action = parse_action(json.dumps(step.action_json))
+                if len(plan) == 0:
+                    ui.error("Couldn't understand that. Try rephrasing.")
+                    continue
+                elif len(plan) == 1:
+                    # simple
+                    step = plan.steps[0]
+                    action = parse_action(step.action_json)
 
-                command = action.render()
+                    command = action.render()
 
-                ui.info(step.description or action.describe())
-                ui.command_box(command)
+                    ui.info(step.description or action.describe())
+                    ui.command_box(command)
 
-                policy = check_command(command)
-                audit.log_policy_check(command, policy.allowed, policy.risk.value, policy.reason)
+                    policy = check_command(command)
+                    audit.log_policy_check(command, policy.allowed, policy.risk.value, policy.reason)
 
-                if not policy.allowed:
-                    ui.risk_display("blocked", policy.reason)
-                    audit.log_blocked(command, policy.reason)
-                    continue
-                
-                ui.risk_display(policy.risk.value, policy.reason)
-                if policy.risk == RiskLevel.HIGH:
-                    confirm = input(f"\n  Type '{ui.orange('yes')}' to confirm: ")
-                    if confirm.lower() != 'yes':
-                        ui.info("Cancelled.")
+                    if not policy.allowed:
+                        ui.risk_display("blocked", policy.reason)
+                        audit.log_blocked(command, policy.reason)
                         continue
-                elif policy.risk == RiskLevel.MEDIUM:
-                    confirm = input(f"  Run? ({ui.green('y')}/{ui.dim('n')}) ")
-                    if confirm.lower() != 'y':
+                
+                    ui.risk_display(policy.risk.value, policy.reason)
+                    if policy.risk.value in APPROVAL_PROMPTS and not get_user_approval(policy.risk.value):
                         ui.info("Cancelled.")
                         continue
 
-                output = exec_fn(command)
-                audit.log_execution(command, output, sandboxed)
-                ui.success("Done")
+                    printer = ui.OutputPrinter()
+                    output = exec_fn(command, printer)
+                    printer.finish()
+                    audit.log_execution(command, output, sandboxed)
 
-                if output and output.strip():
+                    if not printer.started:
+                        print(f"  {ui.dim('(no output)')}")
                     print()
-                    print(ui.dim("  " + output.replace("\n", "\n  ")))
-                else:
-                    print(f"\n  {ui.dim('(no output)')}")
+                    ui.success("Done")
 
-            else:
-                show_plan_preview(plan)
+                else:
+                    show_plan_preview(plan)
 
-                print(f"    1. Step by step  2. Run all")
+                    print(f"    1. Step by step  2. Run all")
                 
-                choice = input(f"  Select (1/2/n): ")
+                    choice = input(f"  Select (1/2/n): ")
 
-                if choice == "1":
-                    step_by_step = True
-                elif choice == "2":
-                    step_by_step = False
-                else:
-                    ui.info("Cancelled.")
-                    continue
+                    if choice == "1":
+                        step_by_step = True
+                    elif choice == "2":
+                        step_by_step = False
+                    else:
+                        ui.info("Cancelled.")
+                        continue
 
-                print()
-                execute_plan(plan, exec_fn, get_user_approval, step_by_step)
+                    print()
+                    execute_plan(plan, exec_fn, get_user_approval, step_by_step)
 
     finally:
         if sandboxed and not cleanup_done:
             cleanup_done = True
+        audit.flush_audit(sync=True)
+        if llm_cache.store:
+            llm_cache.store.flush()
+        if sandbox_strategy is not None:
+            sandbox_strategy.close()
 
 
 if __name__ == "__main__":
@@ -1,26 +1,131 @@
-import json
+import atexit
+import gzip
 import os
+import shutil
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import orjson  # C encoder; writes bytes directly
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    import json
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
+
 AUDIT_LOG = Path.home() / ".hermit" / "audit.log"
 
+FLUSH_BYTES = 32 * 1024  # Write the buffer out once it grows past this
+ROTATE_BYTES = 8 * 1024 * 1024  # Start a new log (and gzip the old one) past this
+
+_buffer = []        # Lines logged but not yet written to AUDIT_LOG
+_buffer_size = 0
+_turn = None        # Events of the current begin_record() block, or None
+_fd = None          # Opened once, on the first write, and kept for the session
+_log_size = 0       # Bytes in the file behind _fd
+
 def init_audit():
     """Create audit directory if needed."""
     AUDIT_LOG.parent.mkdir(parents=True, exist_ok=True)
 
 def log_event(event_type: str, data: dict):
     """Log an event to the audit file."""
-    init_audit()
-    
-    entry = {
+    if _turn is not None:
+        _turn["events"].append({"type": event_type, **data})
+        return
+
+    _buffer_entry({
         "timestamp": datetime.now().isoformat(),
         "type": event_type,
         **data
-    }
-    
-    with open(AUDIT_LOG, "a") as f:
-        f.write(json.dumps(entry) + "\n")
+    })
+
+def _buffer_entry(entry: dict):
+    global _buffer_size
+    line = _dumps(entry) + b"\n"
+    _buffer.append(line)
+    _buffer_size += len(line)
+
+    # Finished turns and blocked commands are written straight away (still
+    # one write per turn) so a killed session keeps its record
+    if _buffer_size >= FLUSH_BYTES or entry["type"] in ("turn", "blocked"):
+        flush_audit()
+
+def flush_audit(sync: bool = False):
+    """Write every buffered event to the audit log in one append.
+
+    Entries are advisory, so they are only fsync'd when sync is set (on exit).
+    """
+    global _buffer_size
+    if _buffer:
+        lines = _buffer[:]
+        _buffer.clear()
+        _buffer_size = 0
+        _append(lines)
+    if sync and _fd is not None:
+        os.fsync(_fd)
+
+atexit.register(flush_audit, sync=True)
+
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
+def _append(lines: list):
+    """Append lines with writev(2): one syscall for the whole batch and
+    no joined copy of it. O_APPEND keeps each call atomic at the file's end."""
+    global _fd, _log_size
+    if _fd is not None and _log_size >= ROTATE_BYTES:
+        _rotate()
+    if _fd is None:
+        init_audit()
+        _fd = os.open(AUDIT_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        _log_size = os.fstat(_fd).st_size
+    for i in range(0, len(lines), IOV_MAX):
+        _log_size += os.writev(_fd, lines[i:i + IOV_MAX])
+
+def _rotate():
+    """Move the full log aside as audit.log.<timestamp> and gzip it in the
+    background; the next write starts a fresh audit.log."""
+    global _fd
+    os.close(_fd)
+    _fd = None
+    segment = AUDIT_LOG.with_name(f"{AUDIT_LOG.name}.{datetime.now():%Y%m%d-%H%M%S-%f}")
+    os.replace(AUDIT_LOG, segment)
+    threading.Thread(target=_compress, args=(segment,), daemon=True).start()
+
+def _compress(segment: Path):
+    # Written under a temporary name so a half-finished .gz is never read
+    tmp = segment.with_name(segment.name + ".gz.tmp")
+    with open(segment, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, segment.with_name(segment.name + ".gz"))
+    segment.unlink()
+
+def _latest_segment() -> Path | None:
+    """Most recent rotated log, compressed or (while gzip runs) not."""
+    segments = [p for p in AUDIT_LOG.parent.glob(AUDIT_LOG.name + ".*")
+                if not p.name.endswith(".tmp")]
+    return max(segments, default=None)
+
+@contextmanager
+def begin_record():
+    """Collect every event logged inside the block into one "turn" entry
+    (request, policy decision, execution...) written when the block ends."""
+    global _turn
+    if _turn is not None:
+        yield  # Already inside a record; its owner writes the turn
+        return
+
+    _turn = {"timestamp": datetime.now().isoformat(), "type": "turn", "events": []}
+    try:
+        yield
+    finally:
+        turn, _turn = _turn, None
+        if turn["events"]:
+            _buffer_entry(turn)
 
 def log_command(user_input: str, generated_command: str):
     """Log when a command is generated."""
@@ -53,30 +158,65 @@ def log_blocked(command: str, reason: str):
         "reason": reason
     })
 
+def log_cache_hit(user_input: str):
+    """Log a plan served from the prompt cache instead of the LLM."""
+    log_event("cache_hit", {
+        "user_input": user_input
+    })
+
+def _tail(path: Path, n: int, chunk_size: int = 4096) -> list:
+    """Last n lines of path, reading backwards from the end in chunks so
+    the cost doesn't grow with the size of the log."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # n lines need n+1 newlines to be complete (the file ends with one)
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.decode(errors="replace").splitlines()[-n:]
+
+# How show_recent() prints each event type (after the timestamp); others are skipped
+FORMATTERS = {
+    "command_generated": lambda e: f"📝 \"{e['user_input']}\" → {e['command']}",
+    "policy_check": lambda e: f"{'✓' if e['allowed'] else '✗'} Policy: {e['risk']} - {e['reason']}",
+    "execution": lambda e: f"{'🔒' if e['sandboxed'] else '🔓'} Executed: {e['command']}",
+    "blocked": lambda e: f"Blocked: {e['command']} ({e['reason']})",
+    "cache_hit": lambda e: f"⚡ Cached plan for \"{e['user_input']}\"",
+}
+
 def show_recent(n: int = 10):
     """Show recent audit entries."""
-    if not AUDIT_LOG.exists():
+    flush_audit()
+    lines = _tail(AUDIT_LOG, n) if AUDIT_LOG.exists() else []
+
+    # Just rotated: fill in from the previous segment
+    if len(lines) < n and (segment := _latest_segment()):
+        opener = gzip.open if segment.suffix == ".gz" else open
+        with opener(segment, "rt", errors="replace") as f:
+            lines = f.read().splitlines()[-(n - len(lines)):] + lines
+
+    if not lines:
         print("No audit log yet.")
         return
-    
-    with open(AUDIT_LOG) as f:
-        lines = f.readlines()
-    
-    for line in lines[-n:]:
-        entry = json.loads(line)
+
+    out = []
+    hits = 0
+    for line in lines:
+        entry = _loads(line)
         ts = entry["timestamp"][:19]
-        event = entry["type"]
-        
-        if event == "command_generated":
-            print(f"[{ts}] 📝 \"{entry['user_input']}\" → {entry['command']}")
-        elif event == "policy_check":
-            status = "✓" if entry["allowed"] else "✗"
-            print(f"[{ts}] {status} Policy: {entry['risk']} - {entry['reason']}")
-        elif event == "execution":
-            mode = "🔒" if entry["sandboxed"] else "🔓"
-            print(f"[{ts}] {mode} Executed: {entry['command']}")
-        elif event == "blocked":
-            print(f"[{ts}] Blocked: {entry['command']} ({entry['reason']})")
+        # A turn is shown as its events, all under the turn's timestamp
+        for event in entry["events"] if entry["type"] == "turn" else (entry,):
+            fmt = FORMATTERS.get(event["type"])
+            if fmt:
+                out.append(f"[{ts}] {fmt(event)}")
+                hits += event["type"] == "cache_hit"
+    print("\n".join(out))
+
+    if hits:
+        print(f"\n{hits} of these requests were answered from the cache.")
 
 
 if __name__ == "__main__":
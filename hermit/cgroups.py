@@ -5,6 +5,22 @@ from pathlib import Path
 CGROUP_NAME = "hermit-sandbox"
 CGROUP_PATH = Path(f"/sys/fs/cgroup/{CGROUP_NAME}")
 
+def _write(path: str, data: str):
+    """One open/write/close on a cgroup control file (no buffering layer)."""
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.write(fd, data.encode())
+    finally:
+        os.close(fd)
+
+def _read_int(path: str) -> int:
+    """First line of a cgroup counter file as an int, in a single read."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return int(os.read(fd, 64).split(b"\n", 1)[0])
+    finally:
+        os.close(fd)
+
 def setup_cgroup(memory_max_mb: int = 512, cpu_quota_percent: int = 50, pids_max: int = 100):
     """Set up cgroup with resource limits.
 
@@ -14,28 +30,29 @@ def setup_cgroup(memory_max_mb: int = 512, cpu_quota_percent: int = 50, pids_max
         pids_max: Maximum number of processes
     """
     CGROUP_PATH.mkdir(exist_ok=True)
+    base = str(CGROUP_PATH)
 
-    parent_subtree = Path("/sys/fs/cgroup/cgroup.subtree_control")
-
-    if parent_subtree.exists():
-        parent_subtree.write_text("+cpu +memory +pids")
+    try:
+        _write("/sys/fs/cgroup/cgroup.subtree_control", "+cpu +memory +pids")
+    except FileNotFoundError:
+        pass
 
     # Memory limit (convert MB to bytes)
     memory_bytes = memory_max_mb * 1024 * 1024
-    (CGROUP_PATH / "memory.max").write_text(str(memory_bytes))
+    _write(f"{base}/memory.max", str(memory_bytes))
 
     # Disable swap to enforce hard memory limit
-    (CGROUP_PATH / "memory.swap.max").write_text("0")
+    _write(f"{base}/memory.swap.max", "0")
 
     # CPU quota (percentage to microseconds per 100ms period)
     quota_us = cpu_quota_percent * 1000
-    (CGROUP_PATH / "cpu.max").write_text(f"{quota_us} 100000")
+    _write(f"{base}/cpu.max", f"{quota_us} 100000")
 
     # PID limit
-    (CGROUP_PATH / "pids.max").write_text(str(pids_max))
+    _write(f"{base}/pids.max", str(pids_max))
 
 def add_process_to_cgroup(pid: int):
-    (CGROUP_PATH / "cgroup.procs").write_text(str(pid))
+    _write(f"{CGROUP_PATH}/cgroup.procs", str(pid))
 
 def cleanup_cgroup():
     if CGROUP_PATH.exists():
@@ -44,6 +61,6 @@ def cleanup_cgroup():
 def get_current_usage() -> dict:
     """Get current resource usage stats."""
     return {
-        "memory_bytes": int((CGROUP_PATH / "memory.current").read_text().strip()),
-        "pids": int((CGROUP_PATH / "pids.current").read_text().strip()),
-    }
\ No newline at end of file
+        "memory_bytes": _read_int(f"{CGROUP_PATH}/memory.current"),
+        "pids": _read_int(f"{CGROUP_PATH}/pids.current"),
+    }
@@ -1,34 +1,51 @@
+import copy
+import functools
+from contextlib import contextmanager
 import json
 import os
 from pathlib import Path
-import subprocess
-import sys
 
-
-def expand_user_path(path: str) -> str:
-    """Expand ~ to the real user's home, even under sudo."""
-    if not path.startswith("~"):
-        return os.path.expanduser(path)
+try:
+    import orjson  # Optional C codec (pip install hermit-shell[fast])
+    def _dumps(obj, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj, pretty: bool = False) -> bytes:
+        if pretty:
+            return json.dumps(obj, indent=2).encode()
+        return json.dumps(obj, separators=(",", ":")).encode()
+    _loads = json.loads
+
+
+@functools.lru_cache(maxsize=1)
+def real_home() -> str:
+    """The real user's home, even under sudo. Looked up once per process."""
     sudo_user = os.environ.get("SUDO_USER")
     if sudo_user:
         import pwd
         try:
-            home = pwd.getpwnam(sudo_user).pw_dir
-            return path.replace("~", home, 1)
+            return pwd.getpwnam(sudo_user).pw_dir
         except KeyError:
             pass
+    return os.path.expanduser("~")
+
+def expand_user_path(path: str) -> str:
+    """Expand ~ to the real user's home, even under sudo."""
+    if path == "~" or path.startswith("~/"):
+        return real_home() + path[1:]
     return os.path.expanduser(path)
 
 def _check_llamacpp_installed() -> bool:
-    """Check if llama-cpp-python is installed."""
-    try:
-        import llama_cpp
-        return True
-    except ImportError:
-        return False
+    """Check if llama-cpp-python is installed. Only looks the package up:
+    importing it would load the native llama.cpp library just to ask."""
+    import importlib.util
+    return importlib.util.find_spec("llama_cpp") is not None
 
 def _install_llamacpp() -> bool:
     """Install llama-cpp-python. Returns True if successful."""
+    import subprocess
+    import sys
     from hermit import ui
 
     print()
@@ -74,6 +91,7 @@ def _install_llamacpp() -> bool:
 
 CONFIG_DIR = Path.home() / ".hermit"
 CONFIG_FILE = CONFIG_DIR / "config.json"
+_CONFIG_TMP = CONFIG_DIR / "config.json.tmp"  # save_config() writes here first
 
 DEFAULT_CONFIG = {
     # LLM settings
@@ -89,6 +107,7 @@ DEFAULT_CONFIG = {
     "llamacpp_n_gpu_layers": -1,  # -1 = all layers on GPU, 0 = CPU only
     "llamacpp_n_batch": 2048,     # Prompt processing batch size
     "llamacpp_n_ubatch": 512,     # Generation microbatch size
+    "llamacpp_n_threads": None,   # None = one per physical core
 
     # Setup flags
     "setup_complete": False,
@@ -105,6 +124,8 @@ DEFAULT_CONFIG = {
     "preferences": {
         "confirm_before_execute": True,
         "dry_run_by_default": False,
+        "semantic_cache": False,
+        "persistent_sandbox": False,
         "auto_organize_extensions": {
             "images": ["jpg", "jpeg", "png", "gif", "webp", "svg", "bmp"],
             "documents": ["pdf", "doc", "docx", "txt", "md", "rtf", "odt"],
@@ -151,20 +172,102 @@ RECOMMENDED_MODELS = [
 
 MODELS_DIR = CONFIG_DIR / "models"
 
+_cache = {"stamp": None, "data": None}  # Parsed config.json, keyed on (mtime, size)
+
+def _read_config() -> dict:
+    """Parsed config, re-read only when config.json's mtime or size changes.
+
+    Shared between callers, so treat the result as read-only; load_config()
+    hands out a copy for callers that modify it.
+    """
+    if _txn["pending"] is not None:
+        return _cache["data"]  # Saved inside config_transaction(), not on disk yet
+    try:
+        st = CONFIG_FILE.stat()
+    except FileNotFoundError:
+        return DEFAULT_CONFIG
+    # Size as well as mtime: an edit within the filesystem's timestamp
+    # granularity usually still changes the length
+    stamp = (st.st_mtime_ns, st.st_size)
+    if stamp != _cache["stamp"]:
+        config = _read_json(CONFIG_FILE)
+        _cache["data"] = _merge(DEFAULT_CONFIG, config)
+        _cache["stamp"] = stamp
+    return _cache["data"]
+
+def invalidate_config_cache():
+    """Force the next read to parse config.json again."""
+    _cache["stamp"] = None
+
+def _merge(base: dict, override: dict) -> dict:
+    """base with override laid on top, recursing into nested sections so a
+    config.json that only sets one preference still gets the other defaults.
+    Returns a new dict; neither argument is modified."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = _merge(merged[key], value)
+        merged[key] = value
+    return merged
+
+def _read_json(path: Path) -> dict:
+    try:
+        return _loads(path.read_bytes())
+    except ValueError:
+        # Left unreadable by an old, non-atomic save? Try the last write
+        # save_config() didn't get to rename into place.
+        try:
+            return _loads(_CONFIG_TMP.read_bytes())
+        except (OSError, ValueError):
+            pass
+        raise
+
 def load_config() -> dict:
     """Load config from disk, or return defaults."""
-    if CONFIG_FILE.exists():
-        with open(CONFIG_FILE) as f:
-            config = json.load(f)
-            # Merge with defaults for any missing keys
-            return {**DEFAULT_CONFIG, **config}
-    return DEFAULT_CONFIG.copy()
-
-def save_config(config: dict):
-    """Save config to disk"""
+    return copy.deepcopy(_read_config())
+
+_txn = {"depth": 0, "pending": None}  # See config_transaction()
+
+@contextmanager
+def config_transaction():
+    """Coalesce the saves made inside the block into one write at the end.
+
+    Reads inside the block see the unsaved changes, so a run of setters
+    (or a settings session) costs one serialize + write instead of one each.
+    """
+    _txn["depth"] += 1
+    try:
+        yield
+    finally:
+        _txn["depth"] -= 1
+        if _txn["depth"] == 0 and _txn["pending"] is not None:
+            config, _txn["pending"] = _txn["pending"], None
+            save_config(config)
+
+def save_config(config: dict, pretty: bool = False):
+    """Save config to disk.
+
+    Written compact, since most saves come from setters and the settings
+    page; pretty=True indents it for the saves people are likely to open in
+    an editor (first-run setup, reset). `hermit config show --raw` prints it
+    indented either way.
+    """
+    if _txn["depth"]:
+        _txn["pending"] = copy.deepcopy(config)
+        _cache["data"] = _merge(DEFAULT_CONFIG, _txn["pending"])
+        return
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    # Write a temp file and rename it over config.json, so a crash or Ctrl+C
+    # mid-save leaves the old config rather than a truncated one. 0600: the
+    # file holds API keys.
+    fd = os.open(_CONFIG_TMP, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, "wb") as f:
+        f.write(_dumps(config, pretty))
+    os.replace(_CONFIG_TMP, CONFIG_FILE)
+    # Keep the cache warm instead of re-parsing what we just wrote
+    _cache["data"] = _merge(DEFAULT_CONFIG, copy.deepcopy(config))
+    st = CONFIG_FILE.stat()
+    _cache["stamp"] = (st.st_mtime_ns, st.st_size)
 
 """
 
@@ -172,11 +275,44 @@ Directory Management
 
 """
 
-def get_allowed_directories() -> list:
+def get_allowed_directories(config: dict = None) -> list:
     """Get list of allowed directory mappings."""
-    config = load_config()
+    if config is None:
+        config = _read_config()
     return config.get("allowed_directories", DEFAULT_CONFIG["allowed_directories"])
 
+_dir_index = {"source": None, "to_sandbox": {}, "to_host": {}}
+
+def _directory_index() -> dict:
+    """allowed_directories as {host: sandbox} and {sandbox: host} dicts.
+    Rebuilt only when the list itself changes."""
+    dirs = get_allowed_directories()
+    if dirs is not _dir_index["source"]:
+        _dir_index["to_sandbox"] = {d["host"]: d["sandbox"] for d in dirs}
+        _dir_index["to_host"] = {d["sandbox"]: d["host"] for d in dirs}
+        _dir_index["source"] = dirs
+    return _dir_index
+
+def resolve_sandbox(host_path: str) -> str | None:
+    """Sandbox path an allowed host folder is mounted at, or None."""
+    return _directory_index()["to_sandbox"].get(_to_tilde(host_path))
+
+def resolve_host(sandbox_path: str) -> str | None:
+    """Host folder (in ~ form) behind a sandbox mount point, or None."""
+    return _directory_index()["to_host"].get(sandbox_path.rstrip("/") or "/")
+
+def _to_tilde(path: str) -> str:
+    """Expand path, then write it as ~/... if it is inside the real user's
+    home (the form allowed_directories stores). Compares whole path
+    components, so /home/user2 is not mistaken for a child of /home/user."""
+    if path.startswith("~"):
+        return path
+    expanded = expand_user_path(path)
+    home = real_home()
+    if expanded == home or expanded.startswith(home + os.sep):
+        return "~" + expanded[len(home):]
+    return expanded
+
 def add_directory(host_path: str, sandbox_name: str = None) -> bool:
     """Add a new directory to allowed_directories.
 
@@ -187,47 +323,50 @@ def add_directory(host_path: str, sandbox_name: str = None) -> bool:
     Returns:
         True if added, False if already exists
     """
+    return add_directories([(host_path, sandbox_name)])[0]
+
+def add_directories(items: list) -> list:
+    """Add several (host_path, sandbox_name) pairs with one config read and
+    one save. Returns a bool per item, as add_directory() would."""
     config = load_config()
+    dirs = config.setdefault("allowed_directories", [])
 
-    # Normalize the path
-    if host_path.startswith("~"):
-        display_path = host_path
-    else:
-        display_path = expand_user_path(host_path)
-        real_home = expand_user_path("~")
-        if display_path.startswith(real_home):
-            display_path = "~" + display_path[len(real_home):]
+    # Index what's there once; each duplicate check is then a set lookup
+    hosts = {d["host"] for d in dirs}
+    sandboxes = {d["sandbox"] for d in dirs}
 
-    # Generate sandbox path if not provided
-    if sandbox_name is None:
-        folder_name = Path(expand_user_path(host_path)).name.lower()
-        sandbox_name = folder_name
+    added = []
+    for host_path, sandbox_name in items:
+        display_path = _to_tilde(host_path)
 
-    sandbox_path = f"/workspace/{sandbox_name}"
+        # Generate sandbox path if not provided
+        if sandbox_name is None:
+            sandbox_name = Path(expand_user_path(host_path)).name.lower()
 
-    # Check if already exists
-    for d in config.get("allowed_directories", []):
-        if d["host"] == display_path or d["sandbox"] == sandbox_path:
-            return False
+        sandbox_path = f"/workspace/{sandbox_name}"
 
-    config.setdefault("allowed_directories", []).append({
-        "host": display_path,
-        "sandbox": sandbox_path
-    })
-    save_config(config)
-    return True
+        if display_path in hosts or sandbox_path in sandboxes:
+            added.append(False)
+            continue
+
+        dirs.append({
+            "host": display_path,
+            "sandbox": sandbox_path
+        })
+        hosts.add(display_path)
+        sandboxes.add(sandbox_path)
+        added.append(True)
+
+    if any(added):
+        save_config(config)
+    return added
 
 def remove_directory(host_path: str) -> bool:
     """Remove a directory from allowed_directories."""
     config = load_config()
     dirs = config.get("allowed_directories", [])
 
-    # Normalize for comparison
-    if not host_path.startswith("~"):
-        expanded = expand_user_path(host_path)
-        real_home = expand_user_path("~")
-        if expanded.startswith(real_home):
-            host_path = "~" + expanded[len(real_home):]
+    host_path = _to_tilde(host_path)  # Stored entries use the ~ form
 
     original_len = len(dirs)
     config["allowed_directories"] = [d for d in dirs if d["host"] != host_path]
@@ -243,43 +382,77 @@ Preferences Management
 
 """
 
-def get_preference(key: str):
-    """Get a preference value by key (supports dot notation)."""
-    config = load_config()
-    prefs = config.get("preferences", DEFAULT_CONFIG["preferences"])
+@functools.lru_cache(maxsize=128)
+def _split_key(key: str) -> tuple:
+    """Dot-notation key as a tuple: "auto_organize_extensions.images"."""
+    return tuple(key.split("."))
 
-    # Support dot notation: "auto_organize_extensions.images"
-    keys = key.split(".")
-    value = prefs
-    for k in keys:
-        if isinstance(value, dict) and k in value:
-            value = value[k]
-        else:
-            return None
+_BOOL_MAP = {"true": True, "false": False}
+
+def _coerce(value):
+    """Turn CLI strings into the types config.json uses: "true"/"false" to
+    bools, integer strings (negative too) to ints. Anything else, including
+    values that are already typed, is returned as is."""
+    if isinstance(value, str):
+        flag = _BOOL_MAP.get(value.lower())
+        if flag is not None:
+            return flag
+        digits = value[1:] if value.startswith("-") else value
+        if digits.isdecimal():
+            return int(value)
     return value
 
+_pref_index = {"source": None, "index": {}}
+
+def _flatten(tree: dict, prefix: str = "") -> dict:
+    """Every node of a nested dict by dotted path, sections included:
+    {"auto_organize_extensions": {...}, "auto_organize_extensions.images": [...]}"""
+    flat = {}
+    for k, v in tree.items():
+        path = f"{prefix}{k}"
+        flat[path] = v
+        if isinstance(v, dict):
+            flat.update(_flatten(v, f"{path}."))
+    return flat
+
+def get_preference(key: str, config: dict = None):
+    """Get a preference value by key (supports dot notation)."""
+    if config is None:
+        config = _read_config()
+    prefs = config.get("preferences", DEFAULT_CONFIG["preferences"])
+    # Flattened once per config load, so any depth of key is one lookup
+    if prefs is not _pref_index["source"]:
+        _pref_index["index"] = _flatten(prefs)
+        _pref_index["source"] = prefs
+    return _pref_index["index"].get(key)
+
+_ext_index = {"source": None, "index": {}}
+
+def get_extension_categories() -> dict:
+    """auto_organize_extensions inverted to {".jpg": "images", ...}, so
+    sorting a file is one dict lookup instead of a scan of every category.
+    Rebuilt only when the preference itself changes."""
+    extensions = _read_config()["preferences"].get("auto_organize_extensions") or {}
+    if extensions is not _ext_index["source"]:
+        _ext_index["index"] = {
+            f".{ext.lower().lstrip('.')}": category
+            for category, exts in extensions.items()
+            for ext in exts
+        }
+        _ext_index["source"] = extensions
+    return _ext_index["index"]
+
 def set_preference(key: str, value) -> bool:
     """Set a preference value. Returns True on success."""
     config = load_config()
     config.setdefault("preferences", {})
 
-    # Handle dot notation
-    keys = key.split(".")
+    *parents, leaf = _split_key(key)
     target = config["preferences"]
-
-    for k in keys[:-1]:
+    for k in parents:
         target = target.setdefault(k, {})
 
-    # Type conversion for common values
-    if isinstance(value, str):
-        if value.lower() == "true":
-            value = True
-        elif value.lower() == "false":
-            value = False
-        elif value.isdigit():
-            value = int(value)
-
-    target[keys[-1]] = value
+    target[leaf] = _coerce(value)
     save_config(config)
     return True
 
@@ -289,9 +462,10 @@ Safety Settings Management
 
 """
 
-def get_safety_setting(key: str):
+def get_safety_setting(key: str, config: dict = None):
     """Get a safety setting value."""
-    config = load_config()
+    if config is None:
+        config = _read_config()
     safety = config.get("safety", DEFAULT_CONFIG["safety"])
     return safety.get(key)
 
@@ -300,16 +474,7 @@ def set_safety_setting(key: str, value) -> bool:
     config = load_config()
     config.setdefault("safety", {})
 
-    # Type conversion
-    if isinstance(value, str):
-        if value.lower() == "true":
-            value = True
-        elif value.lower() == "false":
-            value = False
-        elif value.isdigit():
-            value = int(value)
-
-    config["safety"][key] = value
+    config["safety"][key] = _coerce(value)
     save_config(config)
     return True
 
@@ -319,14 +484,15 @@ Cgroup Settings Management
 
 """
 
-def get_cgroup_config() -> dict:
+def get_cgroup_config(config: dict = None) -> dict:
     """Get cgroup configuration."""
-    config = load_config()
+    if config is None:
+        config = _read_config()
     return config.get("cgroups", DEFAULT_CONFIG["cgroups"])
 
-def is_cgroups_enabled() -> bool:
+def is_cgroups_enabled(config: dict = None) -> bool:
     """Check if cgroups are enabled in config."""
-    cgroup_config = get_cgroup_config()
+    cgroup_config = get_cgroup_config(config)
     return cgroup_config.get("enabled", True)
 
 """
@@ -340,9 +506,10 @@ def get_models_dir() -> Path:
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     return MODELS_DIR
 
-def get_active_backend() -> str:
+def get_active_backend(config: dict = None) -> str:
     """Get currently active backend name."""
-    config = load_config()
+    if config is None:
+        config = _read_config()
     return config.get("llm_backend", "openai")
 
 def set_active_backend(backend: str) -> bool:
@@ -361,9 +528,10 @@ def set_active_backend(backend: str) -> bool:
     save_config(config)
     return True
 
-def get_available_backends() -> list:
+def get_available_backends(config: dict = None) -> list:
     """Return list of configured backends."""
-    config = load_config()
+    if config is None:
+        config = _read_config()
     available = []
 
     if config.get("openai_configured"):
@@ -373,78 +541,84 @@ def get_available_backends() -> list:
 
     return available
 
+def _mask_key(key: str) -> str:
+    """API key as shown on screen: enough to tell keys apart, no more."""
+    return key[:7] + '...' + key[-4:] if key and len(key) > 15 else '(not set)'
+
 def show_config():
     """Display current configuration in a readable format."""
-    config = load_config()
+    # Read-only, so use the cached config directly. It is merged with the
+    # defaults, so every section and key below is present.
+    config = _read_config()
+    prefs, safety, cgroups = config["preferences"], config["safety"], config["cgroups"]
+    out = []  # Printed in one write at the end
 
-    print("\n" + "=" * 50)
-    print("  HERMIT CONFIGURATION")
-    print("=" * 50)
+    out.append("\n" + "=" * 50)
+    out.append("  HERMIT CONFIGURATION")
+    out.append("=" * 50)
 
-    print("\n[LLM Backend]")
-    backend = config.get("llm_backend", "openai")
-    print(f"  Active: {backend}")
-    available = get_available_backends()
-    print(f"  Available: {', '.join(available) if available else 'none'}")
+    out.append("\n[LLM Backend]")
+    out.append(f"  Active: {config['llm_backend']}")
+    available = get_available_backends(config)
+    out.append(f"  Available: {', '.join(available) if available else 'none'}")
 
     # OpenAI setting
-    print("\n[OpenAI]")
+    out.append("\n[OpenAI]")
     if config.get("openai_configured"):
-        key = config.get('openai_key', '')
-        masked = key[:7] + '...' + key[-4:] if key and len(key) > 15 else '(not set)'
-        print(f"  Configured")
-        print(f"  Key: {masked}")
-        print(f"  Model: {config.get('openai_model', 'gpt-4o-mini')}")
+        key = config["openai_key"]
+        masked = _mask_key(key)
+        out.append(f"  Configured")
+        out.append(f"  Key: {masked}")
+        out.append(f"  Model: {config['openai_model']}")
     else:
-        print(f"  Not configured")
+        out.append(f"  Not configured")
 
     # llamacpp
-    print("\n[llama.cpp]")
+    out.append("\n[llama.cpp]")
     if config.get("llamacpp_configured"):
-        model_path = config.get('llamacpp_model_path', '')
+        model_path = config["llamacpp_model_path"]
         model_name = Path(model_path).name if model_path else '(not set)'
-        print(f"  ✓ Configured")
-        print(f"  Model: {model_name}")
+        out.append(f"  ✓ Configured")
+        out.append(f"  Model: {model_name}")
     else:
-        print(f"  ✗ Not configured")
+        out.append(f"  ✗ Not configured")
 
     # Directories
-    print("\n[Allowed Directories]")
-    for d in config.get("allowed_directories", []):
-        host = d["host"]
-        sandbox = d["sandbox"]
-        expanded = expand_user_path(host)
-        exists = "✓" if Path(expanded).exists() else "✗"
-        print(f"  {exists} {host} → {sandbox}")
+    out.append("\n[Allowed Directories]")
+    dirs = config["allowed_directories"]
+    for d in dirs:
+        exists = os.path.exists(expand_user_path(d["host"]))
+        out.append(f"  {'✓' if exists else '✗'} {d['host']} → {d['sandbox']}")
 
     # Preferences
-    print("\n[Preferences]")
-    prefs = config.get("preferences", {})
-    print(f"  Confirm before execute: {prefs.get('confirm_before_execute', True)}")
-    print(f"  Dry run by default: {prefs.get('dry_run_by_default', False)}")
+    out.append("\n[Preferences]")
+    out.append(f"  Confirm before execute: {prefs['confirm_before_execute']}")
+    out.append(f"  Dry run by default: {prefs['dry_run_by_default']}")
 
     # Safety
-    print("\n[Safety]")
-    safety = config.get("safety", {})
-    print(f"  Block rm -rf: {safety.get('block_rm_rf', True)}")
-    print(f"  Confirm deletes: {safety.get('require_confirmation_for_delete', True)}")
-    print(f"  Max files per op: {safety.get('max_files_per_operation', 100)}")
+    out.append("\n[Safety]")
+    out.append(f"  Block rm -rf: {safety['block_rm_rf']}")
+    out.append(f"  Confirm deletes: {safety['require_confirmation_for_delete']}")
+    out.append(f"  Max files per op: {safety['max_files_per_operation']}")
 
     # Cgroups
-    print("\n[Resource Limits (cgroups)]")
-    cgroups = config.get("cgroups", {})
-    print(f"  Enabled: {cgroups.get('enabled', True)}")
-    print(f"  Memory max: {cgroups.get('memory_max_mb', 512)} MB")
-    print(f"  CPU quota: {cgroups.get('cpu_quota_percent', 50)}%")
-    print(f"  Max PIDs: {cgroups.get('pids_max', 100)}")
-    print(f"  Timeout: {cgroups.get('timeout_seconds', 30)}s")
-
-    print("\n" + "=" * 50)
-    print(f"  Config file: {CONFIG_FILE}")
-    print("=" * 50 + "\n")
-
-def first_run_setup() -> dict:
-    """Interactive first-run setup. Returns config."""
+    out.append("\n[Resource Limits (cgroups)]")
+    out.append(f"  Enabled: {cgroups['enabled']}")
+    out.append(f"  Memory max: {cgroups['memory_max_mb']} MB")
+    out.append(f"  CPU quota: {cgroups['cpu_quota_percent']}%")
+    out.append(f"  Max PIDs: {cgroups['pids_max']}")
+    out.append(f"  Timeout: {cgroups['timeout_seconds']}s")
+
+    out.append("\n" + "=" * 50)
+    out.append(f"  Config file: {CONFIG_FILE}")
+    out.append("=" * 50 + "\n")
+    print("\n".join(out))
+
+def first_run_setup(config: dict = None) -> dict:
+    """Interactive first-run setup. Returns config.
+
+    Pass the config if the caller already loaded it; it is updated in place.
+    """
     # Import here to avoid circular imports
     from hermit import ui
 
@@ -452,7 +626,8 @@ def first_run_setup() -> dict:
     print(f"  {ui.bold('First Time Setup')}")
     print()
 
-    config = load_config()
+    if config is None:
+        config = load_config()
 
     # Ask which backend(s) to configure
     print("  Which LLM backend do you want to use?")
@@ -562,7 +737,7 @@ def first_run_setup() -> dict:
         config["llm_backend"] = "llamacpp"
  
     config["setup_complete"] = True
-    save_config(config)
+    save_config(config, pretty=True)
     
     print()
     ui.success("Setup complete!")
@@ -571,34 +746,107 @@ def first_run_setup() -> dict:
     
     return config
 
-def _download_model(model_info: dict) -> str:
-    """Download a model, return path."""
+def _sha256_file(path: Path, digest=None):
+    """Feed a file into a sha256 (new or given) in 1 MiB reads. hashlib uses
+    OpenSSL, which picks the CPU's SHA extensions when it has them."""
+    import hashlib
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest
+
+def _download_model(model_info: dict, retry: bool = True) -> str:
+    """Download a model, return path.
+
+    If the entry has a "sha256", the file is checked against it: an existing
+    model that doesn't match is downloaded again, and a download that
+    doesn't match is discarded and fetched once more from scratch.
+    """
+    import hashlib
+    import urllib.error
     import urllib.request
-    import sys
     from hermit import ui
     
     models_dir = get_models_dir()
     model_path = models_dir / model_info["filename"]
+    expected = model_info.get("sha256")
     
     if model_path.exists():
-        ui.info(f"Model already downloaded: {model_info['filename']}")
-        return str(model_path)
+        if not expected or _sha256_file(model_path).hexdigest() == expected:
+            ui.info(f"Model already downloaded: {model_info['filename']}")
+            return str(model_path)
+        ui.warning(f"{model_info['filename']} doesn't match its checksum; downloading again")
+        model_path.unlink()
     
-    ui.info(f"Downloading {model_info['name']} (~{model_info['size_mb']}MB)...")
+    # Download into a .part file that is only renamed once complete, so an
+    # interrupted download is resumed (HTTP Range) instead of restarted or,
+    # worse, mistaken for a finished model.
+    part = model_path.with_name(model_path.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+
+    if offset:
+        ui.info(f"Resuming {model_info['name']} from {offset // (1024 * 1024)}MB...")
+    else:
+        ui.info(f"Downloading {model_info['name']} (~{model_info['size_mb']}MB)...")
     print()
-    
-    def progress(block_num, block_size, total_size):
-        current = block_num * block_size
-        ui.download_progress(current, total_size)
-    
+
+    request = urllib.request.Request(model_info["url"])
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    digest = None
     try:
-        urllib.request.urlretrieve(model_info["url"], model_path, progress)
+        try:
+            resp = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # 416 means the range starts at or past the end; the .part is only
+            # complete if the server's size ("bytes */<size>") is exactly ours
+            size = (e.headers.get("Content-Range") or "").rpartition("/")[2]
+            if not size.isdecimal() or int(size) != offset:
+                part.unlink()
+                ui.warning("Partial download doesn't match the server's file; starting over")
+                return _download_model(model_info, retry)
+        else:
+            with resp:
+                if resp.status != 206:
+                    offset = 0  # Server ignored the range; start over
+                length = resp.headers.get("Content-Length")
+                total = offset + int(length) if length else 0
+                done = offset
+                # Hash while downloading rather than re-reading GBs afterwards
+                digest = hashlib.sha256()
+                if offset:
+                    _sha256_file(part, digest)
+                with open(part, "ab" if offset else "wb") as f:
+                    # 1 MiB reads: a multi-GB file in a few thousand syscalls
+                    while chunk := resp.read(1 << 20):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        ui.download_progress(done, total)
+                if total and done != total:
+                    raise OSError(f"connection closed at {done} of {total} bytes")
+        if expected:
+            # No digest when the .part was already complete (416)
+            if (digest or _sha256_file(part)).hexdigest() != expected:
+                part.unlink()
+                if retry:
+                    print()
+                    ui.warning("Checksum mismatch; downloading again from scratch")
+                    return _download_model(model_info, retry=False)
+                raise OSError("checksum mismatch, discarded the download")
+        os.replace(part, model_path)
         print()  # Newline after progress bar
         ui.success(f"Downloaded to {model_path}")
         return str(model_path)
     except Exception as e:
         print()
         ui.error(f"Download failed: {e}")
+        if part.exists():
+            ui.info("Run setup again to resume the download.")
         return None
     
 def ensure_setup() -> dict:
@@ -606,7 +854,7 @@ def ensure_setup() -> dict:
     config = load_config()
 
     if not config["setup_complete"]:
-        return first_run_setup()
+        return first_run_setup(config)
 
     return config
 
@@ -620,7 +868,8 @@ def config_cli(args: list) -> bool:
     """Handle 'hermit config' subcommands.
 
     Usage:
-        hermit config show                    - Show all configuration
+        hermit config show [--raw]            - Show all configuration
+                                                (--raw: config.json, indented, key masked)
         hermit config set <key> <value>       - Set a preference or safety setting
         hermit config add-directory <path>    - Add a directory to allowed list
         hermit config remove-directory <path> - Remove a directory
@@ -636,7 +885,13 @@ def config_cli(args: list) -> bool:
     cmd = args[0].lower()
 
     if cmd == "show":
-        show_config()
+        if "--raw" in args[1:]:
+            raw = dict(_read_config())  # Shallow copy: only the key is replaced
+            if raw.get("openai_key"):
+                raw["openai_key"] = _mask_key(raw["openai_key"])
+            print(_dumps(raw, pretty=True).decode())
+        else:
+            show_config()
         return True
 
     elif cmd == "set" and len(args) >= 3:
@@ -681,12 +936,12 @@ def config_cli(args: list) -> bool:
         confirm = input("Reset all settings to defaults? [y/N] ")
         if confirm.lower() == 'y':
             # Keep API keys, reset everything else
-            config = load_config()
-            new_config = DEFAULT_CONFIG.copy()
+            config = _read_config()
+            new_config = copy.deepcopy(DEFAULT_CONFIG)
             new_config["llm_backend"] = config.get("llm_backend")
             new_config["openai_key"] = config.get("openai_key")
             new_config["setup_complete"] = config.get("setup_complete")
-            save_config(new_config)
+            save_config(new_config, pretty=True)
             print("✓ Configuration reset to defaults (API keys preserved)")
         else:
             print("Cancelled.")
@@ -9,7 +9,7 @@ Data provenance: every variable tracks which step produced it.
 
 """
 
-import json
+import re
 from dataclasses import dataclass, field
 from typing import Optional, Callable
 
@@ -18,6 +18,8 @@ from hermit.policy import check_command, RiskLevel
 from hermit.planner import Plan
 from hermit import audit, ui
 
+_STEP_RE = re.compile(r"\$STEP\d+")
+
 @dataclass
 class StepResult:
     """Result of executing one plan step."""
@@ -42,17 +44,23 @@ class ExecutionContext:
         if result.success:
             self.variables[f"$STEP{step_id}"] = result.output.strip()
 
-    def substitute(self, text: str) -> str:
-        """Replace $STEP{n} placeholders with actual outputs.
+    def substitute_obj(self, obj):
+        """Replace $STEP{n} placeholders in every string of a parsed action.
 
-        Values are escaped for JSON embedding since the text is a JSON string.
+        Works on the dict itself, so there is no JSON round trip and no
+        escaping: values go in as plain strings.
         """
-        res = text
-        for var, val in self.variables.items():
-            escaped = val.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t')
-            res = res.replace(var, escaped)
-
-        return res
+        if isinstance(obj, str):
+            if "$STEP" not in obj:
+                return obj
+            # One pass, so $STEP10 is never read as $STEP1 + "0" and
+            # substituted outputs are never scanned again
+            return _STEP_RE.sub(lambda m: self.variables.get(m.group(0), m.group(0)), obj)
+        if isinstance(obj, dict):
+            return {k: self.substitute_obj(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self.substitute_obj(v) for v in obj]
+        return obj
     
     def deps_satisfied(self, depends_on: list) -> tuple:
         """Check if all dependency steps succeeded."""
@@ -64,15 +72,17 @@ class ExecutionContext:
         return True, ""
     
 
+# Whitespace-separated words that contain a "/" and aren't options
+_PATH_RE = re.compile(r"(?<!\S)(?!-)\S*/\S*")
+
 # deal with failure
 def try_adapt(command: str, error_output: str) -> Optional[str]:
     if "No such file or directory" in error_output:
-        # Extract path, mkdir its parent
-        for token in reversed(command.split()):
-            if "/" in token and not token.startswith("-"):
-                parent = "/".join(token.split("/")[:-1])
-                if parent:
-                    return f"mkdir -p {parent}"
+        # Extract path, mkdir its parent (the last path with one, so /foo is skipped)
+        for token in reversed(_PATH_RE.findall(command)):
+            parent = token.rpartition("/")[0]
+            if parent:
+                return f"mkdir -p {parent}"
                 
     if "File exists" in error_output:
         return None  # Already done, not really an error
@@ -82,20 +92,23 @@ def try_adapt(command: str, error_output: str) -> Optional[str]:
 
     return None
 
+_PASSTHROUGH = frozenset(["find", "ls", "grep", "cat", "wc", "head", "tail"])
+
+ERROR_SIGNALS = [
+    "No such file", "Permission denied", "not found",
+    "cannot ", "fatal:", "Error:",
+]
+# One scan of the output for all signals instead of one per signal
+_ERROR_RE = re.compile("|".join(map(re.escape, ERROR_SIGNALS)))
+
 def _looks_like_error(command: str, output: str) -> bool:
     """Heuristic: does the output look like an error?"""
 
-    passthrough = ["find", "ls", "grep", "cat", "wc", "head", "tail"]
-    cmd_base = command.strip().split()[0] if command.strip() else ""
-
-    if cmd_base in passthrough:
+    words = command.split(maxsplit=1)
+    if words and words[0] in _PASSTHROUGH:
         return False
 
-    error_signals = [
-        "No such file", "Permission denied", "not found",
-        "cannot ", "fatal:", "Error:",
-    ]
-    return any(sig in output for sig in error_signals)
+    return _ERROR_RE.search(output) is not None
 
 def execute_plan(plan: Plan, execute_fn: Callable[[str], str], approve_fn: Callable[[str], bool], step_by_step: bool,) -> list:
     """
@@ -125,8 +138,7 @@ def execute_plan(plan: Plan, execute_fn: Callable[[str], str], approve_fn: Calla
             continue
 
         # build command
-        action_str = context.substitute(json.dumps(step.action_json))
-        action = parse_action(action_str)
+        action = parse_action(context.substitute_obj(step.action_json))
         command = action.render()
 
         policy = check_command(command)
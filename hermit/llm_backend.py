@@ -1,13 +1,20 @@
 from abc import ABC, abstractmethod
+import os
 import threading
 
+from hermit import ui
+
 
 class LLMBackend(ABC):
     """Base class that both backends implement."""
     
     @abstractmethod
-    def get_completion(self, system_prompt: str, user_input: str) -> str:
-        """Send prompt to LLM, return response."""
+    def get_completion(self, system_prompt: str, user_input: str, stream_fn=None) -> str:
+        """Send prompt to LLM, return response.
+
+        If given, stream_fn is called with each chunk of text as it is
+        generated (backends that can't stream just skip it).
+        """
         pass
     
     @abstractmethod
@@ -25,6 +32,29 @@ class LLMBackend(ABC):
         """Clear conversation history."""
         pass
 
+    def count_tokens(self, text: str) -> int:
+        """Token count of text. A rough ~4 characters per token unless the
+        backend has its own tokenizer."""
+        return len(text) // 4 + 1
+
+    def _fit_history(self, budget: int):
+        """Drop the oldest turns until the history is within max_history_turns
+        and budget tokens. Each turn's count is kept from when it was added,
+        so nothing already in the history is tokenized again."""
+        while self._history_tokens and (len(self._history_tokens) > self.max_history_turns
+                                        or sum(self._history_tokens) > budget):
+            del self.conversation_history[:2]
+            del self._history_tokens[0]
+
+    def record_turn(self, user_input: str, reply: str):
+        """Add a finished turn to the history. Called by get_completion, and
+        by callers that answered a request without the model (plan cache)."""
+        self.conversation_history.append({"role": "user", "content": user_input})
+        self.conversation_history.append({"role": "assistant", "content": reply})
+        self._history_tokens.append(self.count_tokens(user_input) + self.count_tokens(reply))
+
+_openai_clients = {}  # API key -> OpenAI client (each holds an HTTP keep-alive pool)
+
 class OpenAIBackend(LLMBackend):
     """Online backend using OpenAI API."""
     
@@ -33,17 +63,23 @@ class OpenAIBackend(LLMBackend):
         self.model = model
         self._client = None  # Lazy load
         self.conversation_history = []
+        self._history_tokens = []  # Tokens per turn (user + assistant message)
         self.max_history_turns = 10
+        self.max_history_tokens = 8000  # Resent on every call, so it is billed every call
     
     def _get_client(self):
-        """Lazy-load the OpenAI client."""
+        """Lazy-load the OpenAI client, shared by every backend with the same
+        key so a settings reload or backend switch keeps its warm connections."""
         if self._client is None:
-            from openai import OpenAI
-            self._client = OpenAI(api_key=self.api_key)
+            if self.api_key not in _openai_clients:
+                from openai import OpenAI
+                _openai_clients[self.api_key] = OpenAI(api_key=self.api_key)
+            self._client = _openai_clients[self.api_key]
         return self._client
     
-    def get_completion(self, system_prompt: str, user_input: str) -> str:
+    def get_completion(self, system_prompt: str, user_input: str, stream_fn=None) -> str:
         client = self._get_client()
+        self._fit_history(self.max_history_tokens)
         
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(self.conversation_history)
@@ -52,17 +88,22 @@ class OpenAIBackend(LLMBackend):
         response = client.chat.completions.create(
             model=self.model,
             messages=messages,
-            max_tokens=2048
+            max_tokens=2048,
+            stream=stream_fn is not None,
         )
+        if stream_fn is None:
+            reply = response.choices[0].message.content.strip()
+        else:
+            parts = []
+            for chunk in response:
+                # The last chunk (finish_reason) can come without choices
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    stream_fn(text)
+            reply = "".join(parts).strip()
         
-        reply = response.choices[0].message.content.strip()
-        
-        self.conversation_history.append({"role": "user", "content": user_input})
-        self.conversation_history.append({"role": "assistant", "content": reply})
-        
-        if len(self.conversation_history) > self.max_history_turns * 2:
-            self.conversation_history = self.conversation_history[-(self.max_history_turns * 2):]
-        
+        self.record_turn(user_input, reply)
         return reply
     
     def is_available(self) -> bool:
@@ -73,34 +114,61 @@ class OpenAIBackend(LLMBackend):
     
     def clear_history(self):
         self.conversation_history = []
+        self._history_tokens = []
+
+def _physical_cores() -> int:
+    """Physical cores this process may run on. Generation is bound by matmul,
+    which gains nothing from SMT siblings, and CPUs outside our affinity mask
+    (taskset, container limits) would only contend."""
+    cores = set()
+    for cpu in os.sched_getaffinity(0):
+        try:
+            with open(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list") as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    return len(cores) or 1
 
 class LlamaCPPBackend(LLMBackend):
     
     def __init__(self, model_path: str, n_ctx: int = 4096, n_gpu_layers: int = -1,
-                 n_batch: int = 2048, n_ubatch: int = 512):
+                 n_batch: int = 2048, n_ubatch: int = 512, n_threads: int = None):
         self.model_path = model_path
         self.n_ctx = n_ctx
+        self.n_threads = n_threads or _physical_cores()
         self.n_gpu_layers = n_gpu_layers
         self.n_batch = n_batch
         self.n_ubatch = n_ubatch
         self._load_thread = None
         self._load_error = None
         self._llm = None
+        self._system_tokens = (None, 0)  # (prompt, token count) of the last system prompt
         self.conversation_history = []
+        self._history_tokens = []  # Tokens per turn (user + assistant message)
         self.max_history_turns = 10
 
-    def preload(self):
-        """Start loading model in background. Call during startup."""
+    def preload(self, system_prompt: str = None):
+        """Start loading model in background. Call during startup.
+
+        The REPL is usable straight away; the first query waits for the load
+        if it hasn't finished (see _wait_for_load).
+        """
         def _load():
             try:
                 self._get_llm()
             except Exception as e:
                 self._load_error = e
+                return
+            if system_prompt:
+                try:
+                    self.preload_prefix(system_prompt)
+                except Exception:
+                    pass  # Only a warm-up; the first query prefills instead
         
         self._load_thread = threading.Thread(target=_load, daemon=True)
         self._load_thread.start()
 
-    def get_completion(self, system_prompt, user_input):
+    def _wait_for_load(self):
         # Block here if model isn't ready yet
         if self._load_thread and self._load_thread.is_alive():
             ui.info("Model still loading, please wait...")
@@ -109,6 +177,18 @@ class LlamaCPPBackend(LLMBackend):
         if self._load_error:
             raise RuntimeError(f"Model failed to load: {self._load_error}")
 
+    def preload_prefix(self, system_prompt: str):
+        """Prefill the KV cache with the system prompt.
+
+        llama.cpp reuses the longest matching token prefix from the previous
+        evaluation, so after this the first real query only has to evaluate
+        the user's turn instead of the whole system prompt.
+        """
+        self._get_llm().create_chat_completion(
+            messages=[{"role": "system", "content": system_prompt}],
+            max_tokens=1,
+        )
+
     def _get_llm(self):
         """Lazy-load the model. First call takes a few seconds."""
         if not self._llm:
@@ -119,14 +199,23 @@ class LlamaCPPBackend(LLMBackend):
                 n_gpu_layers=self.n_gpu_layers,
                 n_batch=self.n_batch,
                 n_ubatch=self.n_ubatch,
+                n_threads=self.n_threads,
+                use_mmap=True,  # Map the GGUF instead of reading it all in
                 verbose=False  # Suppress llama.cpp logs
             )
         return self._llm
 
-    def get_completion(self, system_prompt: str, user_input: str) -> str:
+    def get_completion(self, system_prompt: str, user_input: str, stream_fn=None) -> str:
         """Send prompt to LLM, return response."""
+        self._wait_for_load()
         llama = self._get_llm()
 
+        # Keep only as much history as fits in the context next to the
+        # system prompt, the new turn and a full-length reply
+        if self._system_tokens[0] != system_prompt:
+            self._system_tokens = (system_prompt, self.count_tokens(system_prompt))
+        self._fit_history(self.n_ctx - 2048 - self._system_tokens[1] - self.count_tokens(user_input))
+
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(self.conversation_history)
         messages.append({"role": "user", "content": user_input})
@@ -137,26 +226,36 @@ class LlamaCPPBackend(LLMBackend):
             temperature=0.1,
             response_format={
                 "type": "json_object"  # Forces valid JSON
-            }
+            },
+            stream=stream_fn is not None,
         )
-        reply = response['choices'][0]['message']['content'].strip()
-
-        self.conversation_history.append({"role": "user", "content": user_input})
-        self.conversation_history.append({"role": "assistant", "content": reply})
-
-        if len(self.conversation_history) > self.max_history_turns * 2:
-            self.conversation_history = self.conversation_history[-(self.max_history_turns * 2):]
+        if stream_fn is None:
+            reply = response['choices'][0]['message']['content'].strip()
+        else:
+            parts = []
+            for chunk in response:
+                text = chunk['choices'][0]['delta'].get('content')
+                if text:
+                    parts.append(text)
+                    stream_fn(text)
+            reply = "".join(parts).strip()
 
+        self.record_turn(user_input, reply)
         return reply
+
+    def count_tokens(self, text: str) -> int:
+        """Exact count from the model's own tokenizer, or the base estimate
+        while it is still loading (a cached plan can arrive before it is)."""
+        if self._llm is None:
+            return super().count_tokens(text)
+        return len(self._llm.tokenize(text.encode(), add_bos=False, special=True))
     
     def is_available(self) -> bool:
         """Check if backend is properly configured."""
-        import os
         return bool(self.model_path and os.path.exists(self.model_path))
     
     def get_name(self) -> str:
         """Human-readable name for display."""
-        import os
         if self.model_path:
             return f"llama.cpp ({os.path.basename(self.model_path)})"
         return "llama.cpp (not configured)"
@@ -164,6 +263,7 @@ class LlamaCPPBackend(LLMBackend):
     def clear_history(self):
         """Clear conversation history."""
         self.conversation_history = []
+        self._history_tokens = []
 
 def create_backend(config: dict) -> LLMBackend:
     """Factory: create the right backend based on config."""
@@ -181,6 +281,7 @@ def create_backend(config: dict) -> LLMBackend:
             n_gpu_layers=config.get("llamacpp_n_gpu_layers", -1),
             n_batch=config.get("llamacpp_n_batch", 2048),
             n_ubatch=config.get("llamacpp_n_ubatch", 512),
+            n_threads=config.get("llamacpp_n_threads"),
         )
     else:
         raise ValueError(f"Unknown backend: {backend_type}")
\ No newline at end of file
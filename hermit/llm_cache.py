@@ -0,0 +1,255 @@
+"""
+
+Prompt → plan cache for Hermit.
+
+Many requests repeat ("show my downloads", test prompts, demos) and the LLM
+round-trip is by far the slowest part of a REPL turn. Entries are keyed on the
+backend name, the system prompt, the conversation so far and the user input,
+so switching models, changing the prompt or a different earlier turn ("delete
+them" after another listing) simply misses.
+
+"""
+
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DB = Path.home() / ".hermit" / "cache" / "prompt_cache.db"
+
+
+def make_key(model_name: str, system_prompt: str, user_input: str, history: list = ()) -> bytes:
+    """SHA-256 over everything that determines the LLM's answer: history is
+    the backend's conversation_history, which is sent along with every call."""
+    h = hashlib.sha256(f"{model_name}\0{system_prompt}\0".encode())
+    for message in history:
+        h.update(f"{message['role']}\0{message['content']}\0".encode())
+    h.update(f"\1{user_input}".encode())
+    return h.digest()
+
+
+class PromptStore:
+    """SQLite copy of the prompt cache, so answers survive between sessions.
+
+    Reads go through SQLite's memory-mapped page cache; writes are queued to
+    a background thread so the REPL never waits on disk.
+    """
+
+    def __init__(self, path: Path = CACHE_DB, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(hash BLOB PRIMARY KEY, response TEXT NOT NULL, created_at INTEGER NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM cache WHERE created_at <= ?", (self._cutoff(),))
+        self._conn.commit()
+
+        self._writes = queue.Queue()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
+
+    def _cutoff(self) -> int:
+        return int(time.time() - self.ttl_seconds)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            sql, params = self._writes.get()
+            try:
+                conn.execute(sql, params)
+                conn.commit()
+            except sqlite3.Error:
+                pass  # A lost cache write only costs a future LLM call
+            finally:
+                self._writes.task_done()
+
+    def get(self, key: bytes) -> str | None:
+        row = self._conn.execute(
+            "SELECT response FROM cache WHERE hash = ? AND created_at > ?",
+            (key, self._cutoff()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: bytes, response: str):
+        self._writes.put((
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+            (key, response, int(time.time())),
+        ))
+
+    def clear(self):
+        self._writes.put(("DELETE FROM cache", ()))
+
+    def flush(self):
+        """Wait for queued writes to land (call before exiting)."""
+        self._writes.join()
+
+
+class LLMCache:
+    """In-memory LRU of raw LLM responses with a per-entry TTL.
+
+    With a PromptStore attached, misses fall through to disk and new entries
+    are written through, so the cache carries over between sessions.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: float = 3600,
+                 store: PromptStore = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._entries: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: bytes) -> str | None:
+        """Return the cached response, or None on miss/expiry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            if self.store:
+                response = self.store.get(key)
+                if response is not None:
+                    self._remember(key, response)
+                return response
+            return None
+
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: bytes, response: str, persist: bool = True):
+        """Store a response, evicting the least recently used entry if full.
+
+        persist=False keeps it out of the PromptStore (memory only).
+        """
+        self._remember(key, response)
+        if persist and self.store:
+            self.store.put(key, response)
+
+    def _remember(self, key: bytes, response: str):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self, persistent: bool = False):
+        """Drop in-memory entries; persistent=True also empties the disk store."""
+        self._entries.clear()
+        if persistent and self.store:
+            self.store.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class SemanticCache:
+    """Near-miss cache: reuses an answer when a request is a close paraphrase.
+
+    Embeddings live in one float32 matrix so a lookup is a single
+    matrix-vector product. Needs numpy + sentence-transformers (optional).
+
+    Every entry carries a scope (see make_key: backend, system prompt and
+    history, without the request), and only entries of the caller's scope
+    can match.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 500):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._model = None  # Lazy load
+        self._model_lock = threading.Lock()
+        self._matrix = None  # (capacity, d), rows [0, len) in use
+        self._responses: list[str] = []
+        self._scopes: list[bytes] = []  # Parallel to _responses
+        self._next = 0  # Row to overwrite once full
+        self._last = None  # (text, embedding) of the last lookup
+
+    @staticmethod
+    def is_available() -> bool:
+        """Check if the optional embedding dependencies are installed. Only
+        looks them up: importing sentence_transformers pulls in torch."""
+        from importlib.util import find_spec
+        return find_spec("numpy") is not None and find_spec("sentence_transformers") is not None
+
+    def _get_model(self):
+        """Lazy-load the embedding model. First call takes a few seconds."""
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(SEMANTIC_MODEL)
+        return self._model
+
+    def warm(self):
+        """Load the model in the background, e.g. while the user is typing."""
+        threading.Thread(target=self._get_model, daemon=True).start()
+
+    def _embed(self, text: str):
+        if self._last and self._last[0] == text:
+            return self._last[1]
+        vec = self._get_model().encode(text, normalize_embeddings=True).astype("float32")
+        self._last = (text, vec)
+        return vec
+
+    def get(self, text: str, scope: bytes) -> str | None:
+        """Return the response for the most similar request in scope, if close enough."""
+        rows = [i for i, s in enumerate(self._scopes) if s == scope]
+        if not rows:
+            return None
+        q = self._embed(text)
+
+        sims = self._matrix[rows] @ q
+        best = int(sims.argmax())
+        if sims[best] >= self.threshold:
+            return self._responses[rows[best]]
+        return None
+
+    def put(self, text: str, response: str, scope: bytes):
+        import numpy as np
+
+        q = self._embed(text)
+        n = len(self._responses)
+
+        if n >= self.max_entries:
+            # Full: overwrite the oldest row
+            self._matrix[self._next] = q
+            self._responses[self._next] = response
+            self._scopes[self._next] = scope
+            self._next = (self._next + 1) % self.max_entries
+            return
+
+        if self._matrix is None:
+            self._matrix = np.empty((min(16, self.max_entries), q.shape[0]), dtype=np.float32)
+        elif n == self._matrix.shape[0]:
+            # Grow geometrically so inserts stay amortized O(d)
+            grown = np.empty((min(n * 2, self.max_entries), q.shape[0]), dtype=np.float32)
+            grown[:n] = self._matrix
+            self._matrix = grown
+
+        self._matrix[n] = q
+        self._responses.append(response)
+        self._scopes.append(scope)
+
+    def clear(self):
+        self._matrix = None
+        self._responses = []
+        self._scopes = []
+        self._next = 0
+        self._last = None
+
+    def __len__(self):
+        return len(self._responses)
@@ -81,9 +81,10 @@ def unmount_dr(sandbox_path: str) -> bool:
 def list_mounts(active_mounts: list):
     """Show configured directories and their live mount status."""
     print()
+    active = set(active_mounts)  # O(1) lookups instead of a list scan per folder
     for host_path, sandbox_path in get_mount_list():
         sandbox_full = f"{SANDBOX_ROOT}{sandbox_path}"
-        is_mounted = sandbox_full in active_mounts
+        is_mounted = sandbox_full in active
         status = ui.green("mounted") if is_mounted else ui.dim("not mounted")
         print(f"   {host_path} → {sandbox_path}  [{status}]")
     print()
@@ -92,11 +93,11 @@ if __name__ == "__main__":
     print("Testing mount setup...\n")
     
     # Create test folders if needed
-    os.makedirs(os.path.expanduser("~/Downloads"), exist_ok=True)
-    os.makedirs(os.path.expanduser("~/projects"), exist_ok=True)
+    os.makedirs(expand_user_path("~/Downloads"), exist_ok=True)
+    os.makedirs(expand_user_path("~/projects"), exist_ok=True)
     
     # Create a test file
-    test_file = os.path.expanduser("~/Downloads/test_from_host.txt")
+    test_file = expand_user_path("~/Downloads/test_from_host.txt")
     with open(test_file, "w") as f:
         f.write("Hello from host!")
     
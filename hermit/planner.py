@@ -9,12 +9,16 @@ The aim is data + control flows separation.
 
 """
 
-import json
 import re
 from dataclasses import dataclass, field
 from typing import Optional
 from hermit.config import get_allowed_directories
 
+try:
+    import orjson as json  # C parser, same loads()/JSONDecodeError API
+except ImportError:
+    import json
+
 @dataclass
 class PlanStep:
     """Single step in an execution plan."""
@@ -96,6 +100,60 @@ def system_prompt() -> str:
             {{"description": "Create myapp project structure", "steps": [{{"step_id": 1, "action": {{"action": "create_directory", "path": "/workspace/projects/myapp/src"}}, "depends_on": [], "description": "Create src directory"}}, {{"step_id": 2, "action": {{"action": "create_directory", "path": "/workspace/projects/myapp/tests"}}, "depends_on": [], "description": "Create tests directory"}}, {{"step_id": 3, "action": {{"action": "create_file", "path": "/workspace/projects/myapp/src/__init__.py", "content": ""}}, "depends_on": [1], "description": "Add __init__.py to src"}}, {{"step_id": 4, "action": {{"action": "create_file", "path": "/workspace/projects/myapp/tests/__init__.py", "content": ""}}, "depends_on": [2], "description": "Add __init__.py to tests"}}, {{"step_id": 5, "action": {{"action": "create_file", "path": "/workspace/projects/myapp/requirements.txt", "content": ""}}, "depends_on": [], "description": "Create requirements.txt"}}]}}
             """
 
+_STEPS_KEY = re.compile(r'"steps"\s*:\s*\[')
+
+class StepStream:
+    """Pulls complete step objects out of a plan while it is still being
+    generated, so the UI can show progress.
+
+    Nothing is executed early: the whole plan is still parsed, previewed and
+    approved before any step runs (the planner must commit to a fixed plan).
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = None  # Scan position once inside the "steps" array
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Add streamed text; return any steps completed by it."""
+        self._text += chunk
+        if self._pos is None:
+            m = _STEPS_KEY.search(self._text)
+            if not m:
+                return []
+            self._pos = m.end()
+
+        found = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif c == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        found.append(json.loads(text[self._start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+        self._pos = len(text)
+        return found
+
 def parse_plan(raw_response: str) -> Plan:
     response = raw_response.strip()
 
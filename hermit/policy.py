@@ -1,3 +1,4 @@
+import functools
 import re
 from dataclasses import dataclass
 from enum import Enum
@@ -9,7 +10,7 @@ class RiskLevel(Enum):
     HIGH = "high"         # Destructive, needs explicit approval
     BLOCKED = "blocked"   # Never allowed
 
-@dataclass
+@dataclass(frozen=True)  # Shared between calls by check_command's cache
 class PolicyResult:
     allowed: bool
     risk: RiskLevel
@@ -41,6 +42,7 @@ HIGH_RISK_PATTERNS = [
 MEDIUM_RISK_PATTERNS = [
     (r"rm\s+", "Deleting files"),
     (r"mv\s+", "Moving files"),
+    (r"shutil\.move|os\.rename|os\.replace", "Moving files"),
     (r"cp\s+", "Copying files"),
     (r"mkdir", "Creating directories"),
     (r"touch", "Creating files"),
@@ -58,44 +60,75 @@ def get_blocked_patterns() -> list:
     return patterns
 
 
+def _compile_tier(patterns: list) -> tuple:
+    """Compile a tier into one alternation (rejects a command in a single
+    scan) plus the individual rules, in order, to name the one that hit."""
+    combined = re.compile("|".join(f"(?:{pattern})" for pattern, _ in patterns))
+    rules = [(re.compile(pattern), reason) for pattern, reason in patterns]
+    return combined, rules
+
+
+def _first_match(tier: tuple, command: str) -> str | None:
+    """Return the reason of the first rule in the tier that matches."""
+    combined, rules = tier
+    if not combined.search(command):
+        return None
+    for regex, reason in rules:
+        if regex.search(command):
+            return reason
+    return None
+
+
+_BLOCKED = _compile_tier(get_blocked_patterns())
+_HIGH_RISK = _compile_tier(HIGH_RISK_PATTERNS)
+_MEDIUM_RISK = _compile_tier(MEDIUM_RISK_PATTERNS)
+_DELETE = re.compile(r"rm\s+")
+
+
 def check_command(command: str) -> PolicyResult:
     """Check command against policy rules, respecting config safety settings."""
-    command_lower = command.lower().strip()
+    confirm_delete = bool(get_safety_setting("require_confirmation_for_delete"))
+    return _classify(command.lower().strip(), confirm_delete)
+
 
+# Plans often repeat a command (ls, mkdir -p ...); the verdict only depends on
+# the command and the one setting, so identical checks skip the regexes
+@functools.lru_cache(maxsize=256)
+def _classify(command_lower: str, confirm_delete: bool) -> PolicyResult:
     # Check blocked patterns
-    for pattern, reason in get_blocked_patterns():
-        if re.search(pattern, command_lower):
-            return PolicyResult(
-                allowed=False,
-                risk=RiskLevel.BLOCKED,
-                reason=reason
-            )
+    reason = _first_match(_BLOCKED, command_lower)
+    if reason:
+        return PolicyResult(
+            allowed=False,
+            risk=RiskLevel.BLOCKED,
+            reason=reason
+        )
 
     # Check high risk patterns
-    for pattern, reason in HIGH_RISK_PATTERNS:
-        if re.search(pattern, command_lower):
-            return PolicyResult(
-                allowed=True,  # Allowed but needs approval
-                risk=RiskLevel.HIGH,
-                reason=reason
-            )
+    reason = _first_match(_HIGH_RISK, command_lower)
+    if reason:
+        return PolicyResult(
+            allowed=True,  # Allowed but needs approval
+            risk=RiskLevel.HIGH,
+            reason=reason
+        )
 
     # Check medium risk patterns
-    for pattern, reason in MEDIUM_RISK_PATTERNS:
-        if re.search(pattern, command_lower):
-            # If delete confirmation is required, elevate delete operations
-            if get_safety_setting("require_confirmation_for_delete"):
-                if re.search(r"rm\s+", command_lower):
-                    return PolicyResult(
-                        allowed=True,
-                        risk=RiskLevel.HIGH,
-                        reason=f"{reason} (confirmation required)"
-                    )
-            return PolicyResult(
-                allowed=True,
-                risk=RiskLevel.MEDIUM,
-                reason=reason
-            )
+    reason = _first_match(_MEDIUM_RISK, command_lower)
+    if reason:
+        # If delete confirmation is required, elevate delete operations
+        if confirm_delete:
+            if _DELETE.search(command_lower):
+                return PolicyResult(
+                    allowed=True,
+                    risk=RiskLevel.HIGH,
+                    reason=f"{reason} (confirmation required)"
+                )
+        return PolicyResult(
+            allowed=True,
+            risk=RiskLevel.MEDIUM,
+            reason=reason
+        )
 
     return PolicyResult(
         allowed=True,
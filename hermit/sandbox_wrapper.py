@@ -8,6 +8,7 @@ It applies seccomp filters, then executes the command.
 import sys
 import os
 import errno
+import struct
 
 # Set library path before importing pyseccomp (ctypes.util.find_library needs this)
 os.environ["LD_LIBRARY_PATH"] = "/usr/lib:/lib/x86_64-linux-gnu"
@@ -84,10 +85,55 @@ def setup_seccomp():
 
     f.load()
 
+def send(kind: bytes, payload: bytes):
+    os.write(1, kind + struct.pack(">I", len(payload)) + payload)
+
+def serve():
+    """
+    Persistent mode: read length-prefixed commands from stdin, acknowledge
+    each one, run it and stream its output back as framed chunks, ending
+    with its exit code.
+    """
+    stdin = sys.stdin.buffer
+    devnull = os.open("/dev/null", os.O_RDONLY)
+
+    while True:
+        header = stdin.read(4)
+        if len(header) < 4:
+            return
+        command = stdin.read(struct.unpack(">I", header)[0]).decode()
+        # Ack before running, so the host never re-runs a command on failure
+        send(b"S", b"")
+
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.dup2(devnull, 0)
+                os.dup2(w, 1)
+                os.dup2(w, 2)
+                os.execv("/bin/bash", ["/bin/bash", "-c", f"export LC_ALL=C LANG=C; {command}"])
+            finally:
+                os._exit(127)
+        os.close(w)
+
+        while chunk := os.read(r, 65536):
+            send(b"O", chunk)
+        os.close(r)
+
+        _, status = os.waitpid(pid, 0)
+        send(b"X", str(os.waitstatus_to_exitcode(status)).encode())
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: sandbox_wrapper.py <command>", file=sys.stderr)
+        print("Usage: sandbox_wrapper.py <command> | --serve", file=sys.stderr)
         sys.exit(1)
+
+    if sys.argv[1:] == ["--serve"]:
+        # Filter once; every forked command inherits it
+        setup_seccomp()
+        serve()
+        sys.exit(0)
     
     command = " ".join(sys.argv[1:])
     
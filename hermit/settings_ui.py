@@ -13,7 +13,9 @@ On every keypress:
     1. keybinding handler 
 
 """
+import os
 import time
+from pathlib import Path
 from prompt_toolkit import Application
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.layout import Layout, Window
@@ -22,7 +24,9 @@ from prompt_toolkit.formatted_text import FormattedText
 from prompt_toolkit.styles import Style
 from prompt_toolkit.application import run_in_terminal
 
-from hermit.config import load_config, get_allowed_directories, get_cgroup_config, save_config
+from hermit.config import (load_config, get_allowed_directories, get_cgroup_config, save_config,
+                           add_directory, remove_directory, config_transaction,
+                           expand_user_path, MODELS_DIR)
 
 SANDBOX_ROOT = "/home/ubuntu/sandbox-root"
 
@@ -89,10 +93,10 @@ class MainScreen(Screen):
         backend = cfg.get("llm_backend", "openai")
         backend_val = f"OpenAI ({cfg.get('openai_model','gpt-4o-mini')})" if backend == "openai" else "llama.cpp"
 
-        directories = get_allowed_directories()
+        directories = get_allowed_directories(cfg)
         fold_val = f"{len(directories)} configured"
 
-        cg = get_cgroup_config()
+        cg = get_cgroup_config(cfg)
         res_val = f"{cg.get('memory_max_mb',512)}MB, {cg.get('cpu_quota_percent',50)}% CPU"
 
         safety = cfg.get("safety", {})
@@ -258,8 +262,7 @@ class BackendScreen(Screen):
         elif cursor == 1:
             def _edit():
                 try:
-                    from pathlib import Path
-                    models_dir = Path.home() / ".hermit" / "models"
+                    models_dir = MODELS_DIR
                     
                     print()
                     if models_dir.exists():
@@ -361,7 +364,9 @@ class PrefsScreen(Screen):
 
     items = [
         ("confirm_before_execute", "Confirm before execute", "bool"),
-        ("dry_run_by_default", "Dry run by default", "bool")
+        ("dry_run_by_default", "Dry run by default", "bool"),
+        ("semantic_cache", "Semantic cache", "bool"),
+        ("persistent_sandbox", "Persistent sandbox", "bool"),
     ]
 
     def max_items(self):
@@ -460,9 +465,7 @@ class FoldersScreen(Screen):
             path = input("  Host path (e.g. ~/Music): ").strip()
             if not path:
                 return
-            from hermit.config import add_directory
-            import os
-            expanded = os.path.expanduser(path)
+            expanded = expand_user_path(path)
             if not os.path.exists(expanded):
                 print(f"  ✗ Path not found: {expanded}")
                 return
@@ -486,7 +489,6 @@ class FoldersScreen(Screen):
         def _confirm():
             confirm = input(f"  Delete {d['host']}? (y/N): ").strip().lower()
             if confirm == "y":
-                from hermit.config import remove_directory
                 remove_directory(d["host"])
                 state["config"] = load_config()
                 state["cursor"] = max(0, state["cursor"] - 1)
@@ -595,4 +597,6 @@ def run_settings(mounted_paths: list = None):
         import sys, termios
         termios.tcflush(sys.stdin, termios.TCIFLUSH)
 
-    app.run(pre_run=pre_run)
\ No newline at end of file
+    # Every toggle saves; write config.json once when the screen closes
+    with config_transaction():
+        app.run(pre_run=pre_run)
\ No newline at end of file
@@ -1,8 +1,9 @@
 """UI helpers for hermit - Claude-inspired minimal aesthetic."""
 
+import os
 import sys
-import time
 import threading
+from pathlib import Path
 
 class Colors:
     RESET = "\033[0m"
@@ -117,6 +118,37 @@ def download_progress(current: int, total: int, width: int = 40):
         sys.stdout.write(f"\r  {bar} ({mb_current:.1f}/{mb_total:.1f} MB)")
         sys.stdout.flush()
 
+class OutputPrinter:
+    """Prints command output as it streams in, indented and dimmed."""
+
+    def __init__(self, indent: str = "  "):
+        self.indent = indent
+        self.started = False
+        self._line_start = True
+
+    def __call__(self, text: str):
+        if not self.started:
+            print()
+            self.started = True
+
+        parts = []
+        for line in text.splitlines(keepends=True):
+            if self._line_start:
+                parts.append(self.indent)
+            self._line_start = line.endswith("\n")
+            parts.append(dim(line.rstrip("\n")))
+            if self._line_start:
+                parts.append("\n")
+        sys.stdout.write("".join(parts))
+        sys.stdout.flush()
+
+    def finish(self):
+        """End a partial last line."""
+        if self.started and not self._line_start:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
 class Spinner:
     """Animated spinner for thinking/loading states."""
 
@@ -134,38 +166,52 @@ class Spinner:
     ]
 
     def __init__(self):
-        self.running = False
-        self.thread = None
+        self.thread = None  # One long-lived thread, parked while idle
+        self.status = None  # Shown instead of the rotating messages when set
         self.frame = 0
         self.message_index = 0
+        self._active = threading.Event()
+        self._halt = threading.Event()
+        self._done = threading.Event()
 
     def _animate(self):
-        ticks = 0
-        while self.running:
-            frame = SPINNER_FRAMES[self.frame % len(SPINNER_FRAMES)]
-            msg = self.MESSAGES[self.message_index % len(self.MESSAGES)]
-            sys.stdout.write(f"\r\033[K {orange(frame)} {msg}...")
+        while True:
+            self._active.wait()
+            ticks = 0
+            while not self._halt.is_set():
+                frame = SPINNER_FRAMES[self.frame % len(SPINNER_FRAMES)]
+                msg = self.status or self.MESSAGES[self.message_index % len(self.MESSAGES)]
+                sys.stdout.write(f"\r\033[K {orange(frame)} {msg}...")
+                sys.stdout.flush()
+                self.frame += 1
+                ticks += 1
+
+                if ticks % 20 == 0:
+                    self.message_index += 1
+
+                self._halt.wait(0.1)
+            # Clear the line
+            sys.stdout.write("\r\033[K")
             sys.stdout.flush()
-            self.frame += 1
-            ticks += 1
-
-            if ticks % 20 == 0:
-                self.message_index += 1
-
-            time.sleep(0.1)
-        # Clear the line
-        sys.stdout.write("\r\033[K")
-        sys.stdout.flush()
+            self._active.clear()
+            self._done.set()
 
     def start(self):
-        self.running = True
-        self.thread = threading.Thread(target=self._animate)
-        self.thread.start()
+        if self._active.is_set():
+            return
+        self.status = None
+        self._halt.clear()
+        self._done.clear()
+        self._active.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._animate, daemon=True)
+            self.thread.start()
 
     def stop(self):
-        self.running = False
-        if self.thread:
-            self.thread.join()
+        if not self._active.is_set():
+            return
+        self._halt.set()
+        self._done.wait()
 
 
 def print_banner(version: str = "0.1.0"):
@@ -189,8 +235,6 @@ def print_status(sandboxed: bool):
 
 def print_tree(base_path: str, max_depth: int = 2, max_items: int = 8):
     """Print a tree view of the workspace."""
-    import os
-    from pathlib import Path
 
     def count_items(path):
         """Count files and folders in a directory."""
@@ -270,9 +314,20 @@ def separator():
     print(dim("─" * 44))
 
 
+_session = None  # Lazy: prompt_toolkit is only needed for interactive use
+
+
 def prompt() -> str:
-    """Get input with styled prompt."""
+    """Get input with styled prompt (line editing + history on a TTY)."""
+    global _session
+    text = f"\n{orange('hermit')}{PROMPT} "
     try:
-        return input(f"\n{orange('hermit')}{PROMPT} ")
-    except EOFError:
+        if not sys.stdin.isatty():
+            return input(text)
+        if _session is None:
+            from prompt_toolkit import PromptSession
+            _session = PromptSession()
+        from prompt_toolkit.formatted_text import ANSI
+        return _session.prompt(ANSI(text))
+    except (EOFError, KeyboardInterrupt):
         return "exit"